@@ -1,8 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file, abort, g, Response
 from freebox import FreeboxAPI, FreeboxConfig
+from freebox_async import AsyncFreeboxAPI, async_available
+from epg import EpgStore, EpgIngester, FILM_CATEGORY_NAME
+from logos import LogoCache
+from planner import RecordingPlanner
+from selection import SelectedChannelsStore
+import metrics
+from authorization import AuthorizationTracker
+from shared_state import SharedState
+from boxes import BoxRegistry, BoxDispatcher, DEFAULT_BOX
+from scheduler import Scheduler
+from snapshot import SnapshotStore
+from recordings import RecordingsStore
+from channel_index import ChannelIndex, encode_cursor, decode_cursor
+from profiler import SamplingProfiler
 from datetime import datetime
 import json
+import hmac
+import os
+import atexit
+import asyncio
+import queue
+import contextvars
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
+from pathlib import Path
+from werkzeug.local import LocalProxy
 
 # Configuration en dur (inspirée de getprog.py)
 FREEBOX_IP = "192.168.0.254"
@@ -11,28 +36,67 @@ APP_ID = "fr.freebox.magneto_freebox"
 APP_NAME = "Magneto Freebox"
 APP_VERSION = "1.0"
 DEVICE_NAME = "MagnetoFreebox"
-
-# Service centralisé pour les opérations Freebox
+# Mode production (plusieurs workers WSGI) : état partagé entre processus
+PRODUCTION = os.environ.get('MAGNETO_PRODUCTION', '').lower() in ('1', 'true', 'yes')
+# Jeton des administrateurs (profilage à la demande, page /profiles)
+ADMIN_TOKEN = os.environ.get('MAGNETO_ADMIN_TOKEN')
+# Profilage automatique des requêtes plus lentes que ce seuil (désactivé si absent)
+PROFILE_THRESHOLD_MS = float(os.environ.get('MAGNETO_PROFILE_THRESHOLD_MS') or 0)
+
+# Service d'une Freebox : credentials, client API, caches et stockages locaux
 class FreeboxService:
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(FreeboxService, cls).__new__(cls)
-            cls._instance._initialize()
-        return cls._instance
-
-    def _initialize(self):
-        self.config = FreeboxConfig()
+    MAX_WORKERS = 4
+    # Appels simultanés du client asyncio pour les traitements de masse (EPG)
+    ASYNC_CONCURRENCY = 32
+    # Intervalles des rafraîchissements planifiés (secondes)
+    CHANNELS_REFRESH_INTERVAL = 30 * 60
+    RECORDINGS_REFRESH_INTERVAL = 60
+    NOW_PLAYING_REFRESH_INTERVAL = 30
+    EPG_REFRESH_INTERVAL = 60 * 60
+    SESSION_CHECK_INTERVAL = 60
+
+    def __init__(self, name=DEFAULT_BOX, config_dir='data/config', cache_dir='data/cache', settings=None):
+        self.name = name
+        cache_dir = Path(cache_dir)
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix=f'freebox-{name}')
+        self.config = FreeboxConfig(config_dir)
+        if settings and settings.get('api_base_url') and not self.config.config_file.exists():
+            # Nouvelle Freebox : adresse déclarée dans boxes.json
+            credentials = self.config._get_default_credentials()
+            credentials['api_base_url'] = settings['api_base_url']
+            self.config.save_credentials(credentials)
         self.credentials = self.config.load_credentials()
+        self.shared_state = SharedState(cache_dir / 'shared.sqlite') if PRODUCTION else None
+        self.snapshot = SnapshotStore(cache_dir / 'snapshots')
         self.api = FreeboxAPI(
             api_base_url=self.credentials['api_base_url'],
             app_token=self.credentials['app_token'],
-            session_token=self.credentials['session_token']
+            session_token=self.credentials['session_token'],
+            shared_state=self.shared_state,
+            snapshot=self.snapshot,
+            box=name
         )
+        # Démarrage à chaud : la dernière liste connue est servie pendant son rechargement
+        self.api.warm_start()
+        self._channel_index = None
+        self._channel_index_lock = threading.Lock()
+        # Programmations : copie locale synchronisée, reprise de l'instantané au démarrage
+        self.recordings = RecordingsStore(self.api, snapshot=self.snapshot)
+        self.recordings.load_snapshot()
+        self.epg_store = EpgStore(cache_dir / 'epg.sqlite')
+        self.epg_ingester = EpgIngester(self.api, self.epg_store)
+        self.api.on_session_refreshed = self._on_session_refreshed
+        self.logo_cache = LogoCache(self.api, cache_dir / 'logos')
+        self.planner = RecordingPlanner(self.api, self.epg_store)
+        self.selection = SelectedChannelsStore(self.config.config_dir, shared=PRODUCTION)
+        # Un seul poller par demande d'autorisation, partagé par tous les onglets
+        self.auth_tracker = AuthorizationTracker(self._poll_auth_status)
+        self.last_health = None
 
     def refresh(self):
-        """Rafraîchir avec les derniers credentials"""
+        """Rafraîchir avec les derniers credentials (uniquement si le fichier a changé)"""
+        if not self.config.is_stale():
+            return
         self.credentials = self.config.load_credentials()
         self.api.set_tokens(
             app_token=self.credentials['app_token'],
@@ -40,17 +104,179 @@ class FreeboxService:
         )
 
     def get_api(self):
-        """Retourner l'instance API actuelle"""
+        """Retourner l'instance API actuelle et une copie des credentials"""
         self.refresh()  # S'assurer que les tokens sont à jour
-        return self.api, self.config, self.credentials
+        # Copie : une modification n'est visible qu'une fois enregistrée par save_credentials
+        return self.api, self.config, dict(self.credentials)
 
     def save_credentials(self, credentials):
-        """Sauvegarder les credentials"""
-        self.credentials.update(credentials)
-        return self.config.save_credentials(self.credentials)
+        """Sauvegarder les credentials (l'état en mémoire n'est modifié qu'après l'écriture)"""
+        updated = dict(self.credentials, **credentials)
+        if not self.config.save_credentials(updated):
+            return False
+        self.credentials = updated
+        if self.shared_state is not None and 'session_token' in credentials:
+            # Les autres workers reprennent ce token au lieu d'en créer un nouveau
+            self.shared_state.set('session_token', credentials['session_token'])
+        return True
+
+    def _on_session_refreshed(self, session_token):
+        """Enregistrer le token de session renouvelé automatiquement par l'API"""
+        self.save_credentials({
+            'session_token': session_token,
+            'auth_status': 'session_created'
+        })
+
+    def fetch_concurrently(self, calls):
+        """Exécuter en parallèle des appels indépendants à l'API
+
+        calls est un dictionnaire nom -> fonction sans argument. Retourne deux
+        dictionnaires (résultats, erreurs) indexés par ces mêmes noms.
+        """
+        # Le contexte est propagé pour que les appels soient comptés (et profilés) dans la requête courante
+        futures = {
+            name: self.executor.submit(contextvars.copy_context().run, profiler.run_attached, call)
+            for name, call in calls.items()
+        }
+        results, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+        return results, errors
+
+    def get_channel_index(self, channels_result):
+        """Index précalculé des chaînes, reconstruit seulement quand la liste change"""
+        api_base_url = self.credentials['api_base_url']
+        with self._channel_index_lock:
+            index = self._channel_index
+            if index is None or not index.is_current(channels_result, api_base_url):
+                index = self._channel_index = ChannelIndex(channels_result, api_base_url, proxied_logo_url)
+            return index
+
+    def schedule(self, scheduler):
+        """Planifier le rafraîchissement en arrière-plan des données servies par les pages"""
+        authenticated = self._is_authenticated
+        group = self.name
+        scheduler.add('session', self.api.ensure_session, self.SESSION_CHECK_INTERVAL, group=group,
+                      condition=authenticated, description='Renouvellement de la session')
+        scheduler.add('channels', self.api.refresh_tv_channels, self.CHANNELS_REFRESH_INTERVAL, group=group,
+                      condition=authenticated, description='Liste des chaînes')
+        scheduler.add('recordings', self._scheduled_recordings_sync, self.RECORDINGS_REFRESH_INTERVAL, group=group,
+                      initial_delay=1, condition=authenticated, description='Programmations')
+        scheduler.add('now_playing', self._scheduled_now_playing, self.NOW_PLAYING_REFRESH_INTERVAL, group=group,
+                      initial_delay=2, condition=authenticated, description='Programmes en cours')
+        scheduler.add('epg', self._scheduled_epg_refresh, self.EPG_REFRESH_INTERVAL, group=group,
+                      initial_delay=10, condition=authenticated, description='Guide des programmes')
+
+    def _is_authenticated(self):
+        self.refresh()
+        return self.credentials.get('auth_status') == 'session_created' and bool(self.credentials.get('app_token'))
+
+    def _holds_poll_lease(self, name, interval):
+        """Indiquer si ce worker est celui qui interroge la Freebox pour la tâche name
+
+        Le bail n'est pas rendu après la tâche : il expire juste avant l'exécution
+        suivante, de sorte qu'un seul worker interroge la Freebox par intervalle.
+        """
+        if self.shared_state is None:
+            return True
+        return self.shared_state.try_acquire(name, ttl=interval * (1 - Scheduler.JITTER))
+
+    def _scheduled_recordings_sync(self):
+        if self._holds_poll_lease('recordings_sync', self.RECORDINGS_REFRESH_INTERVAL):
+            diff = self.recordings.sync()
+            if self.shared_state is not None:
+                self.shared_state.set('recordings', self.recordings.raw())
+            return diff
+        # Un autre worker interroge la Freebox : reprendre sa copie
+        shared = self.shared_state.get('recordings', max_age=2 * self.RECORDINGS_REFRESH_INTERVAL)
+        if shared is None:
+            return None
+        return self.recordings.update(shared)
+
+    def _scheduled_now_playing(self):
+        # Les autres workers chargent les programmes en cours à la demande
+        if not self._holds_poll_lease('now_playing_refresh', self.NOW_PLAYING_REFRESH_INTERVAL):
+            return None
+        return self.api.get_current_programs(self.selection.get())
+
+    def _scheduled_epg_refresh(self):
+        if self.shared_state is None:
+            return self.refresh_epg(self.selection.get())
+        # Un seul worker met à jour l'EPG (base SQLite commune), les autres passent leur tour
+        if not self.shared_state.try_acquire('epg_refresh', ttl=self.EPG_REFRESH_INTERVAL):
+            return None
+        try:
+            return self.refresh_epg(self.selection.get())
+        finally:
+            self.shared_state.release('epg_refresh')
+
+    def refresh_epg(self, channel_ids):
+        """Mettre à jour l'EPG local (via le client asyncio si aiohttp est installé)"""
+        if not async_available():
+            return self.epg_ingester.refresh(channel_ids)
+
+        async def run():
+            async with AsyncFreeboxAPI(self.api, concurrency=self.ASYNC_CONCURRENCY) as async_api:
+                return await self.epg_ingester.refresh_async(async_api, channel_ids)
+        return asyncio.run(run())
+
+    def check_health(self):
+        """Joignabilité, latence, session et état du disjoncteur de la Freebox"""
+        self.refresh()
+        breaker = self.api.breaker
+        reachable, latency_ms, error = None, None, None
+        if breaker.is_open():
+            # Pas d'appel tant que le circuit est ouvert : le disjoncteur fait foi
+            reachable, error = False, breaker.status().get('last_error')
+        else:
+            start = time.perf_counter()
+            try:
+                # login/ ne nécessite pas de session : simple test de joignabilité
+                reachable = bool(self.api.get_challenge())
+                latency_ms = round((time.perf_counter() - start) * 1000, 1)
+            except Exception as e:
+                reachable, error = False, str(e)
+        self.last_health = {
+            'name': self.name,
+            'api_base_url': self.credentials['api_base_url'],
+            'auth_status': self.credentials.get('auth_status'),
+            'reachable': reachable,
+            'latency_ms': latency_ms,
+            'circuit': breaker.state,
+            'error': error,
+            'checked_at': time.time()
+        }
+        return self.last_health
+
+    def _poll_auth_status(self):
+        # Appelée par le thread du suivi d'autorisation, hors requête : on fixe la Freebox courante
+        token = _current_service.set(self)
+        try:
+            return compute_auth_status()[0]
+        finally:
+            _current_service.reset(token)
+
+    def shutdown(self):
+        """Arrêter le pool de threads et fermer les connexions"""
+        self.executor.shutdown(wait=False)
+        self.selection.flush()
+        self.api.close()
+
+# Freebox servies : « default » à la racine, les autres sous /box/<nom>/
+box_registry = BoxRegistry(FreeboxService)
+_current_service = contextvars.ContextVar('freebox_service', default=None)
 
-# Initialiser le service Freebox
-freebox_service = FreeboxService()
+def current_service():
+    """Service de la Freebox de la requête en cours (Freebox par défaut hors requête)"""
+    service = _current_service.get()
+    return service if service is not None else box_registry.get(DEFAULT_BOX)
+
+freebox_service = LocalProxy(current_service)
+# Fermer proprement les pools de connexions à l'arrêt
+atexit.register(lambda: box_registry.shutdown())
 
 # Décorateurs utilitaires
 def require_authentication(f):
@@ -63,34 +289,116 @@ def require_authentication(f):
     return decorated_function
 
 app = Flask(__name__)
-app.config['DEBUG'] = True
+app.config['DEBUG'] = not PRODUCTION
 app.config['FREEBOX_API_URL'] = API_BASE_URL
+app.wsgi_app = BoxDispatcher(app.wsgi_app)
 
-def normalize_logo_url(logo_url, api_base_url):
-    if not logo_url:
-        return logo_url
-    if not logo_url.startswith('http'):
-        base = api_base_url.replace('/api/v4/', '').replace('https://', 'http://')
-        return base + logo_url
-    if logo_url.startswith('https://'):
-        return logo_url.replace('https://', 'http://')
-    return logo_url
-
-def auto_refresh_session(credentials, freebox_api):
-    """Tenter un rafraîchissement automatique de la session sans interaction utilisateur"""
-    if not credentials.get('app_token'):
-        return False
+@app.before_request
+def select_box():
+    # Freebox désignée par le préfixe /box/<nom>/ (voir boxes.BoxDispatcher)
+    name = request.environ.get(BoxDispatcher.ENVIRON_KEY, DEFAULT_BOX)
     try:
-        result = freebox_api.refresh_session()
-        if result and result.get('success'):
-            credentials['session_token'] = result['result']['session_token']
-            credentials['auth_status'] = 'session_created'
-            freebox_service.save_credentials(credentials)
-            return True
+        service = box_registry.get(name)
+    except KeyError:
+        abort(404)
+    g.box_token = _current_service.set(service)
+
+@app.teardown_request
+def release_box(exception=None):
+    token = g.pop('box_token', None)
+    if token is not None:
+        _current_service.reset(token)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_scope = metrics.begin_request_scope()
+
+@app.after_request
+def record_request_metrics(response):
+    scope = g.pop('metrics_scope', None)
+    if scope is not None:
+        route = request.url_rule.rule if request.url_rule else 'inconnue'
+        upstream_calls = metrics.end_request_scope(scope)
+        metrics.route_duration.observe(time.perf_counter() - g.metrics_start,
+                                       request.method, route, str(response.status_code))
+        metrics.route_upstream_calls.observe(upstream_calls, route)
+    return response
+
+@app.teardown_request
+def close_request_metrics(exception=None):
+    # Requête interrompue par une exception : after_request n'a pas été appelé
+    scope = g.pop('metrics_scope', None)
+    if scope is not None:
+        metrics.end_request_scope(scope)
+
+profiler = SamplingProfiler()
+
+def is_admin():
+    """Requête d'un administrateur : jeton MAGNETO_ADMIN_TOKEN, ou accès local hors production sans jeton
+
+    Le jeton n'est accepté que dans un en-tête, jamais dans l'URL (journaux, historique, Referer).
+    """
+    if ADMIN_TOKEN:
+        supplied = request.headers.get('X-Magneto-Admin-Token') or ''
+        return hmac.compare_digest(supplied.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+    return not PRODUCTION and request.remote_addr in ('127.0.0.1', '::1')
+
+def profiling_requested():
+    """Profilage demandé pour cette requête (en-tête X-Magneto-Profile ou ?profile=1)"""
+    flag = request.headers.get('X-Magneto-Profile') or request.args.get('profile')
+    return bool(parse_bool_arg(flag)) and is_admin()
+
+@app.before_request
+def start_profiling():
+    forced = profiling_requested()
+    if forced or PROFILE_THRESHOLD_MS:
+        # Sans demande explicite, le profil n'est conservé qu'au-delà du seuil
+        g.profile = (profiler.start(), forced)
+
+@app.after_request
+def record_profile_status(response):
+    if 'profile' in g:
+        g.profile_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_profiling(exception=None):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    capture, forced = profile
+    duration = profiler.stop(capture)
+    if not forced and duration * 1000 < PROFILE_THRESHOLD_MS:
+        return
+    try:
+        profiler.save(capture, duration,
+                      method=request.method,
+                      path=request.script_root + request.path,
+                      endpoint=request.endpoint,
+                      status=g.pop('profile_status', 500 if exception is not None else None),
+                      reason='demande' if forced else 'seuil')
     except Exception as e:
-        print(f"Échec du rafraîchissement de session: {str(e)}")
-    return False
-
+        print(f"Erreur lors de l'enregistrement du profil: {str(e)}")
+
+@app.context_processor
+def inject_freebox_health():
+    # Bandeau « mode dégradé » affiché par base.html tant que le circuit est ouvert
+    breaker = freebox_service.api.breaker
+    return {
+        'freebox_degraded': breaker.is_open(),
+        'freebox_retry_in': int(breaker.retry_in()),
+        'current_box': freebox_service.name
+    }
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Exposer les métriques au format Prometheus"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def proxied_logo_url(channel_id):
+    """URL locale du logo d'une chaîne, servie par le proxy /logo/<uuid>"""
+    return url_for('logo', channel_id=channel_id)
 
 def init_default_data():
     # Initialiser les credentials Freebox si inexistants
@@ -123,72 +431,59 @@ def index():
     # Charger les chaînes sélectionnées (nouveau système)
     selected_channels = load_selected_channels()
 
-    # Charger uniquement les chaînes sélectionnées depuis l'API
+    # Charger les chaînes et les programmations PVR en parallèle
     try:
         freebox_api, config, creds = freebox_service.get_api()
-        channels_result = freebox_api.get_tv_channels()
-
-        # Charger les programmations PVR (si autorisé)
-        recordings = []
+        # Freebox injoignable : ne pas attendre les appels, seule la liste en cache est servie
+        degraded = freebox_api.is_degraded()
+        calls = {'channels': freebox_api.get_tv_channels}
+        if not degraded:
+            # Programmations servies depuis la copie locale, synchronisée si elle est trop ancienne
+            calls['recordings'] = freebox_service.recordings.ensure_fresh
+            calls['now_playing'] = lambda: freebox_api.get_current_programs(selected_channels)
+        results, errors = freebox_service.fetch_concurrently(calls)
+        if 'channels' in errors:
+            raise errors['channels']
+        channels_result = results['channels']
+
+        recordings_store = freebox_service.recordings
+        recordings = recordings_store.list()
         pvr_error = None
-        try:
-            # Vérifier si l'API PVR est accessible
-            recordings_result = freebox_api._make_request('GET', 'pvr/programmed/')
-            # Si session expirée, tenter un rafraîchissement automatique
-            if recordings_result.status_code == 403:
-                try:
-                    body = recordings_result.json()
-                    if body.get('error_code') == 'auth_required' and auto_refresh_session(creds, freebox_api):
-                        recordings_result = freebox_api._make_request('GET', 'pvr/programmed/')
-                except Exception:
-                    pass
-            if recordings_result.status_code == 200:
-                recordings_data = recordings_result.json()
-                if recordings_data.get('success'):
-                    for recording in recordings_data.get('result', []):
-                        # Convertir les timestamps Unix en dates lisibles
-                        start_time = datetime.fromtimestamp(recording.get('start', 0)).strftime('%Y-%m-%d %H:%M') if recording.get('start') else 'Inconnu'
-                        end_time = datetime.fromtimestamp(recording.get('end', 0)).strftime('%Y-%m-%d %H:%M') if recording.get('end') else 'Inconnu'
-
-                        recordings.append({
-                            'id': recording.get('id'),
-                            'title': recording.get('name', 'Sans titre'),  # name au lieu de title
-                            'channel': recording.get('channel_name', 'Chaîne inconnue'),
-                            'start_time': start_time,
-                            'end_time': end_time,
-                            'status': recording.get('state', 'inconnu')  # state au lieu de status
-                        })
-            elif recordings_result.status_code == 403:
-                pvr_error = "Accès refusé: authentification requise pour le PVR"
-            elif recordings_result.status_code == 404:
-                pvr_error = "Endpoint PVR non disponible sur cette Freebox"
-            else:
-                pvr_error = f"Erreur PVR: {recordings_result.status_code} - {recordings_result.text}"
-        except Exception as e:
-            pvr_error = f"PVR non accessible: {str(e)}"
-            print(f"Erreur lors du chargement des programmations: {str(e)}")
-
+        recordings_notice = None
+        if 'recordings' in errors:
+            print(f"Erreur lors du chargement des programmations: {str(errors['recordings'])}")
+        if not recordings_store.loaded:
+            if degraded:
+                pvr_error = "Freebox injoignable : programmations indisponibles pour le moment"
+            elif 'recordings' in errors:
+                pvr_error = f"PVR non accessible: {str(errors['recordings'])}"
+        elif recordings_store.is_stale():
+            recordings_notice = (
+                f"Programmations connues au {datetime.fromtimestamp(recordings_store.updated_at).strftime('%d/%m %H:%M')}"
+                + (" (Freebox injoignable)" if degraded or recordings_store.last_error else " (mise à jour en cours)")
+            )
+
+        now_playing = results.get('now_playing', {})
+
+        # Filtrer UNIQUEMENT les chaînes sélectionnées et disponibles (triées par UUID)
+        selected_channels_list = []
         if channels_result and channels_result.get('success'):
-            channels_dict = channels_result.get('result', {})
-            # Filtrer UNIQUEMENT les chaînes sélectionnées et disponibles
-            selected_channels_list = []
-            for channel_uuid, channel_data in channels_dict.items():
-                if channel_data.get('available', False) and channel_data.get('uuid') in selected_channels:
-                    selected_channels_list.append({
-                        'id': channel_data.get('uuid'),
-                        'name': channel_data.get('name'),
-                        'logo': normalize_logo_url(channel_data.get('logo_url'), creds['api_base_url']),
-                        'selected': True  # Toujours true puisque filtré
-                    })
-
-            # Trier par UUID croissant
-            selected_channels_list.sort(key=lambda x: x['id'])
-            return render_template('index.html',
-                                 app_name=APP_NAME,
-                                 credentials=credentials,
-                                 channels=selected_channels_list,
-                                 recordings=recordings,
-                                 pvr_error=pvr_error)
+            channel_index = freebox_service.get_channel_index(channels_result)
+            selected_channels_list = [{
+                'id': channel.id,
+                'name': channel.name,
+                'logo': channel.logo,
+                'selected': True,  # Toujours true puisque filtré
+                'current_program': now_playing.get(channel.id)
+            } for channel in channel_index.select(selected_channels)]
+
+        return render_template('index.html',
+                             app_name=APP_NAME,
+                             credentials=credentials,
+                             channels=selected_channels_list,
+                             recordings=recordings,
+                             recordings_notice=recordings_notice,
+                             pvr_error=pvr_error)
     except Exception as e:
         print(f"Erreur lors du chargement des chaînes: {str(e)}")
         return render_template('index.html',
@@ -250,35 +545,85 @@ def start_authentication():
             'error': f"Erreur de connexion: {str(e)}"
         }), 500
 
+AUTH_APPROVAL_TIMEOUT = 30
+
 @app.route('/check_auth_status', methods=['GET'])
 def check_auth_status():
     """Vérifier l'état de l'authentification"""
+    payload, status_code = compute_auth_status()
+    return jsonify(payload), status_code
+
+@app.route('/auth_status_stream')
+def auth_status_stream():
+    """Flux server-sent events des changements d'état de l'authentification"""
+    credentials = freebox_service.get_api()[2]
+    track_id = credentials.get('track_id')
+    # Le flux est lu après la fin de la requête : on garde le suivi de cette Freebox
+    tracker = freebox_service.auth_tracker
+
+    def stream():
+        if credentials['auth_status'] != 'waiting_approval' or track_id is None:
+            yield f"data: {json.dumps({'status': credentials['auth_status']})}\n\n"
+            return
+
+        events = tracker.subscribe(track_id)
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    # Commentaire SSE pour garder la connexion ouverte
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+                if event.get('status') not in AuthorizationTracker.PENDING_STATUSES:
+                    return
+        finally:
+            tracker.unsubscribe(track_id, events)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def compute_auth_status():
+    """Évaluer l'état de l'authentification, retourne (payload, code HTTP)
+
+    Utilisée par /check_auth_status et par le suivi partagé du flux SSE.
+    """
     credentials = freebox_service.get_api()[2]
 
     if credentials['auth_status'] != 'waiting_approval':
-        return jsonify({'status': credentials['auth_status']})
+        return {'status': credentials['auth_status']}, 200
 
     # Vérifier si le délai de 30 secondes a été dépassé
     if credentials.get('last_auth_attempt'):
         last_attempt = datetime.fromisoformat(credentials['last_auth_attempt'])
-        if (datetime.now() - last_attempt).total_seconds() > 30:
+        if (datetime.now() - last_attempt).total_seconds() > AUTH_APPROVAL_TIMEOUT:
             credentials['auth_status'] = 'not_started'
             freebox_service.save_credentials(credentials)
-            return jsonify({'status': 'not_started', 'message': 'Délai expiré. Veuillez réessayer.'})
+            return {'status': 'not_started', 'message': 'Délai expiré. Veuillez réessayer.'}, 200
 
     try:
         # Utiliser la nouvelle classe FreeboxAPI
         freebox_api, config, creds = freebox_service.get_api()
 
         # Vérifier si l'utilisateur a approuvé sur la Freebox
-        auth_status_result = freebox_api.get_auth_status()
+        auth_status_result = freebox_api.get_auth_status(credentials.get('track_id'))
 
         if not auth_status_result or not auth_status_result.get("success"):
-            return jsonify({
+            return {
                 'status': 'waiting_approval',
                 'message': auth_status_result.get("msg", "En attente...") if auth_status_result else "En attente d'approbation...",
                 'current_status': auth_status_result.get("result", {}).get("status") if auth_status_result else None
-            })
+            }, 200
+
+        # Demande refusée ou expirée côté Freebox
+        if auth_status_result['result']['status'] in ('denied', 'timeout'):
+            credentials['auth_status'] = 'not_started'
+            freebox_service.save_credentials(credentials)
+            return {
+                'status': 'not_started',
+                'message': 'Demande refusée sur la Freebox.' if auth_status_result['result']['status'] == 'denied' else 'Délai expiré. Veuillez réessayer.'
+            }, 200
 
         # Si approuvé, récupérer le challenge pour la session
         if auth_status_result['result']['status'] == 'granted':
@@ -286,10 +631,10 @@ def check_auth_status():
             challenge_result = freebox_api.get_challenge()
 
             if not challenge_result or not challenge_result.get("success"):
-                return jsonify({
+                return {
                     'status': 'error',
                     'message': challenge_result.get("msg", "Impossible de récupérer le challenge") if challenge_result else "Impossible de récupérer le challenge"
-                }), 500
+                }, 500
 
             credentials['auth_status'] = 'authorized'
             credentials['challenge'] = challenge_result['result']['challenge']
@@ -299,39 +644,39 @@ def check_auth_status():
             try:
                 session_result = create_session_helper(credentials)
                 if session_result['success']:
-                    return jsonify({
+                    return {
                         'status': 'session_created',
                         'message': 'Session créée avec succès!',
                         'session_token': credentials['session_token']
-                    })
+                    }, 200
                 else:
                     # Si la création automatique échoue, garder le statut authorized
                     # pour permettre une tentative manuelle
-                    return jsonify({
+                    return {
                         'status': 'authorized',
                         'message': 'Authentification approuvée! La création automatique de session a échoué.',
                         'challenge': credentials['challenge'],
                         'error': session_result.get('error', 'Erreur inconnue')
-                    })
+                    }, 200
             except Exception as e:
-                return jsonify({
+                return {
                     'status': 'authorized',
                     'message': 'Authentification approuvée! La création automatique de session a échoué.',
                     'challenge': credentials['challenge'],
                     'error': str(e)
-                })
+                }, 200
 
-        return jsonify({
+        return {
             'status': 'waiting_approval',
             'message': 'En attente d\'approbation...',
             'current_status': auth_status_result['result']['status']
-        })
+        }, 200
 
     except Exception as e:
-        return jsonify({
+        return {
             'status': 'error',
             'message': f"Erreur de connexion: {str(e)}"
-        }), 500
+        }, 500
 
 def create_session_helper(credentials):
     """Helper pour créer une session - utilisée par check_auth_status et create_session"""
@@ -428,88 +773,478 @@ def channels():
         # Vérifier que la réponse est bien un dictionnaire
         if not channels_result or not isinstance(channels_result, dict) or not channels_result.get('success'):
             error_msg = channels_result.get('msg', 'Impossible de récupérer les chaînes') if isinstance(channels_result, dict) else str(channels_result)
-            return render_template('channels.html', error=error_msg, channels=[])
-
-        # La réponse contient un dictionnaire de chaînes
-        channels_dict = channels_result.get('result', {})
-        selected_channels = load_selected_channels()
+            return render_template('channels.html', error=error_msg, first_page=None,
+                                 page_size=CHANNELS_PAGE_SIZE)
 
-        # Construire la liste des chaînes avec leurs infos
-        channels_with_info = []
-        for channel_uuid, channel_data in channels_dict.items():
-            if not channel_data.get('available', False):
-                continue
-
-            channels_with_info.append({
-                'id': channel_data.get('uuid'),
-                'name': channel_data.get('name'),
-                'short_name': channel_data.get('short_name'),
-                'logo': normalize_logo_url(channel_data.get('logo_url'), credentials['api_base_url']),
-                'available': True,
-                'favorite': channel_data.get('favorite', False),
-                'selected': channel_data.get('uuid') in selected_channels
-            })
-
-        # Trier par UUID
-        channels_with_info.sort(key=lambda x: x['id'])
-
-        return render_template('channels.html', channels=channels_with_info, error=None)
+        # Seule la première page est incluse, la suite est chargée par /api/channels
+        channel_index = freebox_service.get_channel_index(channels_result)
+        first_page = channels_page(channel_index, load_selected_channels(), {})
+        return render_template('channels.html', first_page=first_page,
+                             page_size=CHANNELS_PAGE_SIZE, error=None)
 
     except Exception as e:
         print(f"[ERREUR] channels route: {str(e)}")
         if app.config['DEBUG']:
             import traceback
             traceback.print_exc()
-        return render_template('channels.html', error=str(e), channels=[])
+        return render_template('channels.html', error=str(e), first_page=None,
+                             page_size=CHANNELS_PAGE_SIZE)
+
+CHANNEL_FIELDS = ('id', 'name', 'short_name', 'logo', 'favorite', 'selected')
+CHANNELS_PAGE_SIZE = 60
+CHANNELS_MAX_PAGE_SIZE = 500
+
+def parse_bool_arg(value):
+    """Filtre booléen optionnel d'une query string (None si absent)"""
+    if value is None or value == '':
+        return None
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+def channels_page(channel_index, selected_channels, params):
+    """Page de chaînes au format JSON (curseur, taille, champs et filtres de params)
+
+    Lève ValueError si un paramètre est invalide.
+    """
+    order = params.get('order', 'uuid')
+    if order not in ChannelIndex.ORDERS:
+        raise ValueError(f"Ordre {order} non supporté")
+    fields = [field for field in (params.get('fields') or '').split(',') if field] or list(CHANNEL_FIELDS)
+    unknown = [field for field in fields if field not in CHANNEL_FIELDS]
+    if unknown:
+        raise ValueError(f"Champs inconnus: {', '.join(unknown)}")
+    try:
+        limit = min(max(int(params.get('limit', CHANNELS_PAGE_SIZE)), 1), CHANNELS_MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('Paramètre limit invalide')
+    selected = parse_bool_arg(params.get('selected'))
+    favorite = parse_bool_arg(params.get('favorite'))
+
+    def matches(channel):
+        if selected is not None and (channel.id in selected_channels) != selected:
+            return False
+        if favorite is not None and channel.favorite != favorite:
+            return False
+        return True
 
-def load_selected_channels():
-    """Charger la liste des chaînes sélectionnées depuis le fichier JSON"""
-    config = FreeboxConfig()
-    selected_file = config.config_dir / "selected_channels.json"
+    channels, last_key = channel_index.page(
+        order=order,
+        after=decode_cursor(params.get('cursor'), order),
+        limit=limit,
+        prefix=params.get('prefix') or None,
+        predicate=matches if selected is not None or favorite is not None else None
+    )
+    result = [{
+        field: channel.id in selected_channels if field == 'selected' else getattr(channel, field)
+        for field in fields
+    } for channel in channels]
+    return {
+        'success': True,
+        'result': result,
+        'next_cursor': encode_cursor(last_key, order) if last_key is not None else None,
+        'total': len(channel_index)
+    }
 
-    if not selected_file.exists():
-        return set()
+@app.route('/api/channels')
+@require_authentication
+def api_channels():
+    """Liste paginée des chaînes disponibles au format JSON
 
+    Paramètres : cursor, limit, fields (ex. id,name), order (uuid, name,
+    favorite) et les filtres selected, favorite et prefix (début du nom).
+    """
     try:
-        with open(selected_file, 'r') as f:
-            data = json.load(f)
-            return set(data.get('selected', []))
+        freebox_api, config, credentials = freebox_service.get_api()
+        channels_result = freebox_api.get_tv_channels()
+        if not channels_result or not channels_result.get('success'):
+            error = channels_result.get('msg', 'Impossible de récupérer les chaînes') if channels_result else "Pas de réponse de l'API"
+            return jsonify({'success': False, 'error': error}), 502
+        channel_index = freebox_service.get_channel_index(channels_result)
+        return jsonify(channels_page(channel_index, load_selected_channels(), request.args))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        print(f"Erreur lors du chargement des sélections: {str(e)}")
-        return set()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def load_selected_channels():
+    """Retourner les chaînes sélectionnées (copie de l'état en mémoire)"""
+    return freebox_service.selection.get()
 
 def save_selected_channels(selected_channels):
-    """Sauvegarder la liste des chaînes sélectionnées dans un fichier JSON"""
-    config = FreeboxConfig()
-    selected_file = config.config_dir / "selected_channels.json"
+    """Remplacer la sélection (écriture différée et atomique du fichier JSON)"""
+    freebox_service.selection.replace(selected_channels)
+    return True
+
+def search_films_from_request(freebox_api, credentials):
+    """Rechercher dans l'EPG local à partir des paramètres de la requête"""
+    selected_channels = load_selected_channels()
 
+    # Métadonnées des chaînes sélectionnées (nom, logo) depuis l'index des chaînes
+    channels_list = []
+    channels_result = freebox_api.get_tv_channels()
+    if channels_result and channels_result.get('success'):
+        channel_index = freebox_service.get_channel_index(channels_result)
+        channels_list = channel_index.select(selected_channels, order='name', available_only=False)
+    channels_map = {channel.id: channel for channel in channels_list}
+
+    channel_id = request.args.get('channel') or None
+    channel_ids = [channel_id] if channel_id in selected_channels else selected_channels
+    days = request.args.get('days', 7, type=int)
+    min_duration = request.args.get('min_duration', type=int)
+    max_duration = request.args.get('max_duration', type=int)
+    now = int(datetime.now().timestamp())
+
+    filters = {
+        'q': request.args.get('q', ''),
+        'category': request.args.get('category', FILM_CATEGORY_NAME),
+        'channel': channel_id,
+        'days': days,
+        'min_duration': min_duration,
+        'max_duration': max_duration
+    }
+    programs = freebox_service.epg_store.search_programs(
+        query=filters['q'],
+        channel_ids=channel_ids,
+        category_name=filters['category'] or None,
+        start=now,
+        end=now + days * 86400,
+        min_duration=min_duration * 60 if min_duration else None,
+        max_duration=max_duration * 60 if max_duration else None,
+        limit=request.args.get('limit', 200, type=int)
+    )
+
+    films = []
+    for program in programs:
+        channel = channels_map.get(program['channel_uuid'])
+        films.append({
+            'id': program['id'],
+            'title': program['title'] or 'Sans titre',
+            'sub_title': program['sub_title'],
+            'category': program['category_name'],
+            'channel_id': program['channel_uuid'],
+            'channel': channel.name if channel else 'Chaîne inconnue',
+            'channel_logo': channel.logo if channel else None,
+            'start': program['start'],
+            'end': program['end'],
+            'duration': program['duration'] // 60,
+            'start_time': datetime.fromtimestamp(program['start']).strftime('%Y-%m-%d %H:%M'),
+            'description': program['description']
+        })
+
+    return films, filters, channels_list
+
+@app.route('/films')
+@require_authentication
+def films():
+    """Rechercher les films à venir sur les chaînes sélectionnées"""
     try:
-        with open(selected_file, 'w') as f:
-            json.dump({'selected': list(selected_channels)}, f, indent=2)
-        return True
+        freebox_api, config, credentials = freebox_service.get_api()
+        films_list, filters, channels_list = search_films_from_request(freebox_api, credentials)
+        return render_template('films.html',
+                             app_name=APP_NAME,
+                             films=films_list,
+                             filters=filters,
+                             channels=channels_list,
+                             categories=freebox_service.epg_store.list_categories(),
+                             error=None)
+    except Exception as e:
+        print(f"[ERREUR] films route: {str(e)}")
+        return render_template('films.html', app_name=APP_NAME, films=[], filters={},
+                             channels=[], categories=[], error=str(e))
+
+@app.route('/api/films')
+@require_authentication
+def api_films():
+    """Recherche de films au format JSON"""
+    try:
+        freebox_api, config, credentials = freebox_service.get_api()
+        films_list, filters, _ = search_films_from_request(freebox_api, credentials)
+        return jsonify({'success': True, 'filters': filters, 'result': films_list})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/plan_recordings', methods=['POST'])
+@require_authentication
+def plan_recordings():
+    """Vérifier les conflits d'un lot de programmes et programmer ceux qui passent"""
+    payload = request.get_json(silent=True)
+    programs = payload.get('programs') if isinstance(payload, dict) else None
+    if not isinstance(programs, list) or not all(
+            isinstance(item, dict) and isinstance(item.get('channel_uuid'), str)
+            and isinstance(item.get('id'), (str, int)) and not isinstance(item.get('id'), bool)
+            for item in programs):
+        return jsonify({'success': False, 'error': 'Format invalide: liste de programmes {channel_uuid, id} attendue'}), 400
+    keys = [(item['channel_uuid'], item['id']) for item in programs]
+    if not keys:
+        return jsonify({'success': False, 'error': 'Aucun programme fourni'}), 400
+
+    try:
+        freebox_api, config, credentials = freebox_service.get_api()
+        existing_result = freebox_api.get_programmed_recordings()
+        if not existing_result or not existing_result.get('success'):
+            error = existing_result.get('msg', 'Programmations indisponibles') if existing_result else "Pas de réponse de l'API"
+            return jsonify({'success': False, 'error': error}), 502
+
+        candidates = freebox_service.epg_store.get_programs(keys)
+        plan = freebox_service.planner.plan(candidates, existing_result.get('result') or [],
+                                            channel_ids=load_selected_channels())
+        submitted = None
+        if payload.get('submit', True):
+            submitted = freebox_service.planner.submit(plan['accepted'])
+            freebox_service.recordings.sync_in_background()
+
+        return jsonify({'success': True, 'plan': plan, 'submitted': submitted})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/refresh_epg', methods=['POST'])
+@require_authentication
+def refresh_epg():
+    """Mettre à jour l'EPG local des chaînes sélectionnées"""
+    try:
+        freebox_service.get_api()
+        stats = freebox_service.refresh_epg(load_selected_channels())
+        return jsonify({'success': True, 'stats': stats})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+RECORDINGS_PAGE_SIZE = 50
+RECORDINGS_MAX_PAGE_SIZE = 500
+# Les programmations sont toujours triées par heure de début
+RECORDINGS_ORDER = 'start'
+
+@app.route('/api/recordings')
+@require_authentication
+def api_recordings():
+    """Programmations de la copie locale au format JSON, paginées
+
+    Paramètres : cursor, limit et les filtres status, channel (UUID), q
+    (titre), from et to (timestamps de début).
+    """
+    try:
+        recordings_store = freebox_service.recordings
+        if not freebox_service.api.is_degraded():
+            recordings_store.ensure_fresh()
+        limit = min(max(request.args.get('limit', RECORDINGS_PAGE_SIZE, type=int), 1), RECORDINGS_MAX_PAGE_SIZE)
+        recordings, last_key = recordings_store.page(
+            after=decode_cursor(request.args.get('cursor'), RECORDINGS_ORDER),
+            limit=limit,
+            status=request.args.get('status') or None,
+            channel_uuid=request.args.get('channel') or None,
+            query=request.args.get('q') or None,
+            start=request.args.get('from', type=int),
+            end=request.args.get('to', type=int)
+        )
+        return jsonify({
+            'success': True,
+            'result': recordings,
+            'next_cursor': encode_cursor(last_key, RECORDINGS_ORDER) if last_key is not None else None,
+            'sync': recordings_store.status()
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/sync_recordings', methods=['POST'])
+@require_authentication
+def sync_recordings():
+    """Synchroniser immédiatement les programmations, retourne les différences"""
+    try:
+        freebox_service.get_api()
+        diff = freebox_service.recordings.sync()
+        return jsonify({'success': True, 'diff': diff, 'sync': freebox_service.recordings.status()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+LOGO_MAX_AGE = 7 * 24 * 3600
+
+@app.route('/logo/<channel_id>')
+def logo(channel_id):
+    """Servir le logo d'une chaîne depuis le cache disque"""
+    freebox_api, config, credentials = freebox_service.get_api()
+    try:
+        channels_result = freebox_api.get_tv_channels()
     except Exception as e:
-        print(f"Erreur lors de la sauvegarde des sélections: {str(e)}")
-        return False
+        print(f"Erreur lors du chargement du logo {channel_id}: {str(e)}")
+        channels_result = None
+
+    channel = None
+    if channels_result and channels_result.get('success'):
+        channel = freebox_service.get_channel_index(channels_result).get(channel_id)
+    if channel is None or not channel.logo_source:
+        abort(404)
+
+    try:
+        image_path, meta = freebox_service.logo_cache.get(channel_id, channel.logo_source)
+    except Exception as e:
+        print(f"Erreur lors du chargement du logo {channel_id}: {str(e)}")
+        abort(404)
+
+    response = send_file(image_path, mimetype=meta.get('mimetype'), etag=meta['etag'],
+                         conditional=True, max_age=LOGO_MAX_AGE)
+    response.cache_control.public = True
+    return response
 
 @app.route('/toggle_selection/<channel_id>', methods=['POST'])
 def toggle_selection(channel_id):
     """Basculer la sélection d'une chaîne"""
     try:
-        selected_channels = load_selected_channels()
+        selected_channels = freebox_service.selection.toggle(channel_id)
+        return jsonify({'success': True, 'selected': list(selected_channels)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        # Basculer et sauvegarder en une opération
-        if channel_id in selected_channels:
-            selected_channels.remove(channel_id)
-        else:
-            selected_channels.add(channel_id)
+@app.route('/bulk_selection', methods=['POST'])
+@require_authentication
+def bulk_selection():
+    """Sélectionner ou désélectionner plusieurs chaînes en une requête
+
+    Corps JSON : {"action": "select" | "deselect" | "replace", puis au choix
+    "channel_ids": [...], "favorites": true ou "bouquet": <id>}
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'error': 'Format invalide: objet JSON attendu'}), 400
+    action = payload.get('action', 'select')
+    if action not in ('select', 'deselect', 'replace'):
+        return jsonify({'success': False, 'error': f"Action {action} non supportée"}), 400
+    channel_ids = payload.get('channel_ids', [])
+    if not isinstance(channel_ids, list) or not all(
+            isinstance(channel_id, str) and channel_id for channel_id in channel_ids):
+        return jsonify({'success': False, 'error': "Format invalide: liste d'identifiants de chaînes attendue"}), 400
 
-        if not save_selected_channels(selected_channels):
-            return jsonify({'success': False, 'error': 'Échec de la sauvegarde'}), 500
+    try:
+        channel_ids = set(channel_ids)
+
+        if channel_ids or payload.get('favorites') or payload.get('bouquet') is not None:
+            freebox_api, config, credentials = freebox_service.get_api()
+            if channel_ids or payload.get('favorites'):
+                channels_result = freebox_api.get_tv_channels()
+                if not channels_result or not channels_result.get('success'):
+                    return jsonify({'success': False, 'error': 'Impossible de récupérer les chaînes'}), 502
+                channel_index = freebox_service.get_channel_index(channels_result)
+                # Une chaîne disparue de la liste peut encore être désélectionnée
+                known_ids = channel_index.by_id.keys() | (load_selected_channels() if action == 'deselect' else set())
+                unknown_ids = channel_ids - known_ids
+                if unknown_ids:
+                    return jsonify({'success': False, 'error': f"Chaînes inconnues: {', '.join(sorted(unknown_ids))}"}), 400
+            if payload.get('favorites'):
+                channel_ids.update(channel_index.favorite_ids)
+            if payload.get('bouquet') is not None:
+                bouquet_result = freebox_api.get_bouquet_channels(payload['bouquet'])
+                if not bouquet_result or not bouquet_result.get('success'):
+                    return jsonify({'success': False, 'error': 'Impossible de récupérer le bouquet'}), 502
+                channel_ids.update(
+                    channel.get('uuid') for channel in bouquet_result.get('result') or []
+                    if channel.get('uuid')
+                )
+
+        if action == 'select':
+            selected_channels = freebox_service.selection.update(select=channel_ids)
+        elif action == 'deselect':
+            selected_channels = freebox_service.selection.update(deselect=channel_ids)
+        else:
+            selected_channels = freebox_service.selection.replace(channel_ids)
 
         return jsonify({'success': True, 'selected': list(selected_channels)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/scheduler')
+def scheduler_status():
+    """État des rafraîchissements planifiés de la Freebox courante"""
+    scheduler = box_registry.scheduler
+    jobs = scheduler.status(group=freebox_service.name)
+    for job in jobs:
+        job['last_run_time'] = datetime.fromtimestamp(job['last_run']).strftime('%H:%M:%S') if job['last_run'] else None
+        job['next_run_time'] = datetime.fromtimestamp(job['next_run']).strftime('%H:%M:%S') if job['next_run'] else None
+    if request.args.get('format') == 'json':
+        return jsonify({'success': True, 'running': scheduler.running, 'jobs': jobs})
+    return render_template('scheduler.html', app_name=APP_NAME, jobs=jobs,
+                         running=scheduler.running)
+
+@app.route('/scheduler/<name>/run', methods=['POST'])
+def run_scheduled_job(name):
+    """Lancer immédiatement une tâche planifiée"""
+    if not box_registry.scheduler.run_now(name, group=freebox_service.name):
+        return jsonify({'success': False, 'error': f"Tâche {name} inconnue"}), 404
+    return jsonify({'success': True})
+
+@app.route('/boxes')
+def boxes():
+    """Freebox servies par l'application et leur dernier contrôle de santé"""
+    if request.args.get('check'):
+        boxes_status = box_registry.check_health()
+    else:
+        boxes_status = box_registry.status()
+    for box in boxes_status:
+        box['checked_time'] = datetime.fromtimestamp(box['checked_at']).strftime('%H:%M:%S') if box['checked_at'] else None
+        box['url'] = '/' if box['name'] == DEFAULT_BOX else f"/box/{box['name']}/"
+    if request.args.get('format') == 'json':
+        return jsonify({'success': True, 'boxes': boxes_status})
+    return render_template('boxes.html', app_name=APP_NAME, boxes=boxes_status)
+
+@app.route('/boxes', methods=['POST'])
+def add_box():
+    """Déclarer une nouvelle Freebox"""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = request.form
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'error': 'Format invalide: objet JSON attendu'}), 400
+    name = payload.get('name') or ''
+    api_base_url = payload.get('api_base_url') or ''
+    if not isinstance(name, str) or not isinstance(api_base_url, str):
+        return jsonify({'success': False, 'error': 'Format invalide: nom et URL attendus sous forme de texte'}), 400
+    name = name.strip()
+    api_base_url = api_base_url.strip()
+    if not api_base_url.startswith(('http://', 'https://')):
+        return jsonify({'success': False, 'error': "URL de l'API invalide"}), 400
+    if not api_base_url.endswith('/'):
+        api_base_url += '/'
+    try:
+        box_registry.add(name, api_base_url)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    if request.is_json:
+        return jsonify({'success': True, 'name': name, 'url': f'/box/{name}/'})
+    return redirect('/boxes')
+
+@app.route('/profiles')
+def profiles():
+    """Profils de requêtes enregistrés (administrateurs)"""
+    if not is_admin():
+        abort(403)
+    captures = profiler.list()
+    for capture in captures:
+        capture['created_time'] = datetime.fromtimestamp(capture['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+    if request.args.get('format') == 'json':
+        return jsonify({'success': True, 'profiles': captures})
+    return render_template('profiles.html', app_name=APP_NAME, profiles=captures,
+                         threshold_ms=PROFILE_THRESHOLD_MS)
+
+@app.route('/profiles/<name>')
+def profile_file(name):
+    """Profil au format collapsed stacks (flamegraph.pl, speedscope...)"""
+    if not is_admin():
+        abort(403)
+    path = profiler.path(name)
+    if path is None:
+        abort(404)
+    return send_file(path.resolve(), mimetype='text/plain', as_attachment=bool(request.args.get('download')),
+                     download_name=f'{name}.folded')
+
+# En production (gunicorn), chaque worker rafraîchit ses données en arrière-plan
+if PRODUCTION:
+    box_registry.start_scheduler()
+
 if __name__ == '__main__':
     init_default_data()
+    # Avec le rechargeur de Flask, seul le processus qui sert les requêtes planifie les rafraîchissements
+    if not app.config['DEBUG'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        box_registry.start_scheduler()
     app.run(host='0.0.0.0', port=8030, debug=app.config['DEBUG'])
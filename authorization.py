@@ -0,0 +1,74 @@
+import queue
+import threading
+import time
+
+
+class AuthorizationTracker:
+    """Suivi côté serveur d'une demande d'autorisation Freebox
+
+    Un seul thread interroge la Freebox par track_id, quel que soit le nombre
+    d'onglets abonnés ; chaque changement d'état est diffusé à tous les abonnés.
+    """
+
+    POLL_INTERVAL = 1.0
+    MAX_DURATION = 120
+    PENDING_STATUSES = ('waiting_approval', 'error')
+
+    def __init__(self, poll, poll_interval=POLL_INTERVAL, max_duration=MAX_DURATION):
+        # poll() retourne un dictionnaire contenant au moins la clé 'status'
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.max_duration = max_duration
+        self._lock = threading.Lock()
+        self._watches = {}
+
+    def subscribe(self, track_id):
+        """S'abonner aux changements d'état, retourne une file d'événements"""
+        events = queue.Queue()
+        with self._lock:
+            watch = self._watches.get(track_id)
+            if watch is None:
+                watch = self._watches[track_id] = {'subscribers': set(), 'last_event': None}
+                threading.Thread(target=self._run, args=(track_id, watch), daemon=True).start()
+            watch['subscribers'].add(events)
+            if watch['last_event'] is not None:
+                events.put(watch['last_event'])
+        return events
+
+    def unsubscribe(self, track_id, events):
+        with self._lock:
+            watch = self._watches.get(track_id)
+            if watch is not None:
+                watch['subscribers'].discard(events)
+
+    def _broadcast(self, watch, event):
+        with self._lock:
+            watch['last_event'] = event
+            subscribers = list(watch['subscribers'])
+        for events in subscribers:
+            events.put(event)
+
+    def _run(self, track_id, watch):
+        deadline = time.monotonic() + self.max_duration
+        last_key = None
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    event = self.poll()
+                except Exception as e:
+                    event = {'status': 'error', 'message': f"Erreur de connexion: {str(e)}"}
+
+                key = (event.get('status'), event.get('current_status'))
+                if key != last_key:
+                    last_key = key
+                    self._broadcast(watch, event)
+                # Les erreurs (réseau, challenge) sont retentées jusqu'à l'échéance
+                if event.get('status') not in self.PENDING_STATUSES:
+                    return
+                time.sleep(self.poll_interval)
+
+            self._broadcast(watch, {'status': 'not_started', 'message': 'Délai expiré. Veuillez réessayer.'})
+        finally:
+            with self._lock:
+                if self._watches.get(track_id) is watch:
+                    del self._watches[track_id]
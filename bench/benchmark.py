@@ -0,0 +1,226 @@
+"""Mesures de latence et de débit du client FreeboxAPI et des routes Flask
+
+Démarre une Freebox simulée (bench.mock_freebox), prépare un répertoire de
+données temporaire puis mesure chaque scénario séquentiellement et en
+parallèle :
+
+    python -m bench.benchmark --channels 400 --latency 15 --iterations 200 --concurrency 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.mock_freebox import MockFreebox  # noqa: E402
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(name, func, iterations, concurrency):
+    """Exécuter func iterations fois avec concurrency threads, retourne les statistiques"""
+    durations = []
+    errors = 0
+
+    def run_once(_):
+        start = time.perf_counter()
+        try:
+            func()
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for duration, error in executor.map(run_once, range(iterations)):
+            durations.append(duration)
+            if error is not None:
+                errors += 1
+    wall = time.perf_counter() - wall_start
+
+    durations.sort()
+    return {
+        'name': name,
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'errors': errors,
+        'p50_ms': percentile(durations, 0.50) * 1000,
+        'p90_ms': percentile(durations, 0.90) * 1000,
+        'p99_ms': percentile(durations, 0.99) * 1000,
+        'mean_ms': statistics.fmean(durations) * 1000 if durations else 0.0,
+        'throughput': iterations / wall if wall else 0.0
+    }
+
+
+def prepare_data_dir(mock):
+    """Créer un répertoire de travail avec des credentials pointant vers la Freebox simulée"""
+    data_dir = Path(tempfile.mkdtemp(prefix='magneto-bench-'))
+    config_dir = data_dir / 'data' / 'config'
+    config_dir.mkdir(parents=True)
+    with open(config_dir / 'freebox.json', 'w') as f:
+        json.dump({
+            'api_base_url': mock.api_base_url,
+            'app_token': mock.state.app_token,
+            'session_token': None,
+            'track_id': mock.state.track_id,
+            'auth_status': 'session_created',
+            'challenge': None,
+            'last_auth_attempt': None
+        }, f, indent=2)
+    selected = [uuid for uuid, channel in mock.state.channels.items() if channel['available']][:30]
+    with open(config_dir / 'selected_channels.json', 'w') as f:
+        json.dump({'selected': selected}, f, indent=2)
+    return data_dir
+
+
+def api_scenarios(mock):
+    from freebox import FreeboxAPI
+
+    api = FreeboxAPI(mock.api_base_url, app_token=mock.state.app_token)
+    api.refresh_session()
+    channel_ids = list(mock.state.channels)[:30]
+
+    def current_programs_cold():
+        api.programs_cache.invalidate()
+        api.get_current_programs(channel_ids)
+
+    scenarios = [
+        ('api: tv/channels/ (sans cache)', api._fetch_tv_channels),
+        ('api: tv/channels/ (cache)', api.get_tv_channels),
+        ('api: programme en cours', lambda: api.get_current_program(channel_ids[0])),
+        ('api: 30 programmes en cours (froid)', current_programs_cold),
+        ('api: pvr/programmed/', lambda: api._make_request('GET', 'pvr/programmed/')),
+    ]
+    return api, scenarios
+
+
+def epg_scenarios(mock, days):
+    """Recherches dans une base EPG locale de days jours pour 100 chaînes"""
+    from epg import EpgStore, normalize_program
+
+    store = EpgStore(Path(tempfile.mkdtemp(prefix='magneto-bench-epg-')) / 'epg.sqlite')
+    channel_ids = list(mock.state.channels)[:100]
+    start = int(time.time())
+    end = start + days * 86400
+    store.store_window(start, channel_ids, [
+        normalize_program(channel_id, program)
+        for channel_id in channel_ids
+        for program in mock.state.epg_window(channel_id, start, span=days * 86400).values()
+    ])
+
+    def search(query=None, category_name=None):
+        return lambda: store.search_programs(query, channel_ids=channel_ids, category_name=category_name,
+                                             start=start, end=end, min_duration=0)
+
+    return [
+        (f'epg: titre ({days} j)', search('amelie')),
+        (f'epg: catégorie ({days} j)', search(category_name='Film')),
+        (f'epg: titre + catégorie ({days} j)', search('amelie', 'Film')),
+    ]
+
+
+def route_scenarios():
+    import app as flask_app
+
+    client = flask_app.app.test_client()
+    channel_id = sorted(flask_app.load_selected_channels())[0]
+
+    def get(path):
+        def call():
+            response = client.get(path)
+            if response.status_code >= 400:
+                raise Exception(f'{path}: {response.status_code}')
+        return call
+
+    def toggle():
+        response = client.post(f'/toggle_selection/{channel_id}')
+        if response.status_code >= 400:
+            raise Exception(f'toggle_selection: {response.status_code}')
+
+    return flask_app, [
+        ('route: /', get('/')),
+        ('route: /channels', get('/channels')),
+        ('route: /toggle_selection', toggle),
+    ]
+
+
+def print_report(results, request_counts):
+    header = f"{'scénario':<40} {'conc':>4} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'req/s':>9} {'err':>4}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['name']:<40} {r['concurrency']:>4} {r['p50_ms']:>9.2f} {r['p90_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['throughput']:>9.1f} {r['errors']:>4}")
+    print()
+    print('Appels reçus par la Freebox simulée :')
+    for endpoint, count in sorted(request_counts.items()):
+        print(f'  {endpoint:<50} {count:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Magneto Freebox')
+    parser.add_argument('--channels', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=5, help='Latence simulée (ms)')
+    parser.add_argument('--jitter', type=float, default=0, help='Variation de latence (ms)')
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--auth-error-rate', type=float, default=0)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--epg-days', type=int, default=7, help="Jours d'EPG pour les recherches locales")
+    parser.add_argument('--only', choices=['api', 'epg', 'routes'], help='Limiter à une famille de scénarios')
+    parser.add_argument('--json', help='Écrire les résultats dans ce fichier JSON')
+    args = parser.parse_args()
+    json_path = Path(args.json).resolve() if args.json else None
+
+    mock = MockFreebox(channel_count=args.channels, latency=args.latency / 1000,
+                       jitter=args.jitter / 1000, error_rate=args.error_rate,
+                       auth_error_rate=args.auth_error_rate).start()
+    results = []
+    try:
+        if args.only in (None, 'api'):
+            api, scenarios = api_scenarios(mock)
+            for name, func in scenarios:
+                for concurrency in (1, args.concurrency):
+                    results.append(measure(name, func, args.iterations, concurrency))
+            stats = api.get_pool_stats()
+            print(f"Pool HTTP : {stats['requests']} requêtes, {stats['connections']} connexions "
+                  f"({stats['reused']} réutilisations)\n")
+            api.close()
+
+        if args.only in (None, 'epg'):
+            for name, func in epg_scenarios(mock, args.epg_days):
+                for concurrency in (1, args.concurrency):
+                    results.append(measure(name, func, args.iterations, concurrency))
+
+        if args.only in (None, 'routes'):
+            # L'application lit ses données dans data/ relatif au répertoire courant
+            os.chdir(prepare_data_dir(mock))
+            flask_app, scenarios = route_scenarios()
+            for name, func in scenarios:
+                for concurrency in (1, args.concurrency):
+                    results.append(measure(name, func, args.iterations, concurrency))
+            flask_app.box_registry.shutdown()
+    finally:
+        mock.stop()
+
+    print_report(results, mock.state.request_counts)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'results': results, 'upstream_calls': mock.state.request_counts}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
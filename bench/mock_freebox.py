@@ -0,0 +1,373 @@
+"""Serveur Freebox simulé pour le développement et les mesures de performance
+
+Implémente les endpoints utilisés par FreeboxAPI (login, tv/channels,
+programmes en cours, EPG, bouquets, pvr/programmed, logos) avec des réponses
+de taille réaliste, une latence configurable et l'injection d'erreurs.
+
+    python -m bench.mock_freebox --port 8031 --channels 400 --latency 20
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = '/api/v4/'
+# Plus petit PNG valide (1x1 transparent)
+LOGO_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+CATEGORIES = [(1, 'Film'), (2, 'Téléfilm'), (3, 'Série/Feuilleton'), (4, 'Documentaire'),
+              (5, 'Magazine'), (6, 'Sport'), (7, 'Information'), (8, 'Jeunesse')]
+TITLE_WORDS = ['Le', 'La', 'Les', 'Dernier', 'Secret', 'Nuit', 'Été', 'Mystère', 'Retour',
+               'Grand', 'Voyage', 'Amélie', 'Château', 'Rivière', 'Étoile', 'Ombre', 'Cœur']
+
+
+class MockFreeboxState:
+    """État partagé du serveur simulé"""
+
+    def __init__(self, channel_count=300, latency=0.0, jitter=0.0, error_rate=0.0,
+                 auth_error_rate=0.0, program_duration=5400, seed=42):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.auth_error_rate = auth_error_rate
+        self.program_duration = program_duration
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.app_token = secrets.token_urlsafe(48)
+        self.challenge = secrets.token_urlsafe(24)
+        self.sessions = set()
+        self.track_id = 1
+        self.authorize_status = 'granted'
+        self.recordings = {}
+        self.next_recording_id = 1
+        self.request_counts = {}
+        self.channels = self._build_channels(channel_count)
+
+    def _build_channels(self, count):
+        channels = {}
+        for index in range(count):
+            channel_uuid = f'uuid-webtv-{index + 1}'
+            name = f'Chaîne {index + 1}'
+            channels[channel_uuid] = {
+                'uuid': channel_uuid,
+                'name': name,
+                'short_name': f'CH{index + 1}',
+                'logo_url': f'/api/v4/tv/img/channels/logos68x60/{channel_uuid}.png',
+                'available': self.random.random() > 0.1,
+                'has_service': True,
+                'has_abo': True,
+                'favorite': index % 7 == 0,
+                'pub_service': index < 20
+            }
+        return channels
+
+    def count(self, endpoint):
+        with self.lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def new_session(self):
+        token = secrets.token_urlsafe(32)
+        with self.lock:
+            self.sessions.add(token)
+        return token
+
+    def expire_sessions(self):
+        """Invalider toutes les sessions (simule une expiration côté box)"""
+        with self.lock:
+            self.sessions.clear()
+
+    def program(self, channel_uuid, start):
+        """Programme déterministe d'une chaîne pour un créneau donné"""
+        slot = start - start % self.program_duration
+        rnd = random.Random(f'{channel_uuid}:{slot}')
+        category, category_name = rnd.choice(CATEGORIES)
+        title = ' '.join(rnd.choice(TITLE_WORDS) for _ in range(rnd.randint(2, 4)))
+        return {
+            'id': f'pluri_{channel_uuid}_{slot}',
+            'date': slot,
+            'duration': self.program_duration,
+            'title': title,
+            'sub_title': rnd.choice(['', 'Épisode 1', 'Inédit']),
+            'category': category,
+            'category_name': category_name,
+            'desc': 'Lorem ipsum dolor sit amet, ' * rnd.randint(5, 20),
+            'picture': f'/api/v4/tv/img/programs/{slot}.jpg'
+        }
+
+    def epg_window(self, channel_uuid, start, span=7200):
+        programs = {}
+        slot = start - start % self.program_duration
+        while slot < start + span:
+            program = self.program(channel_uuid, slot)
+            programs[program['id']] = program
+            slot += self.program_duration
+        return programs
+
+
+class MockFreeboxHandler(BaseHTTPRequestHandler):
+    """Gestionnaire HTTP du serveur simulé"""
+
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps sont écrits séparément : sans TCP_NODELAY, Nagle et l'ACK
+    # retardé ajoutent ~40 ms à chaque réponse sur une connexion keep-alive
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _success(self, result=None):
+        body = {'success': True}
+        if result is not None:
+            body['result'] = result
+        self._send_json(body)
+
+    def _auth_required(self):
+        self._send_json({
+            'success': False, 'error_code': 'auth_required',
+            'msg': 'Erreur d\'authentification de l\'application'
+        }, status=403)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _simulate_conditions(self):
+        """Appliquer latence et erreurs injectées, retourne False si la réponse est déjà envoyée"""
+        state = self.state
+        delay = state.latency + (state.random.uniform(0, state.jitter) if state.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if state.error_rate and state.random.random() < state.error_rate:
+            self._send_json({'success': False, 'error_code': 'internal_error', 'msg': 'Erreur interne'}, 500)
+            return False
+        return True
+
+    def _authenticated(self, endpoint):
+        state = self.state
+        if endpoint.startswith('login/') or endpoint == 'login/':
+            return True
+        if state.auth_error_rate and state.random.random() < state.auth_error_rate:
+            state.expire_sessions()
+            return False
+        return self.headers.get('X-Fbx-App-Auth') in state.sessions
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        path = self.path.split('?', 1)[0]
+        body = self._read_body() if method in ('POST', 'PUT') else {}
+
+        if path.startswith('/api/v4/tv/img/'):
+            self.state.count('logo')
+            return self._send_logo()
+        if not path.startswith(API_PREFIX):
+            return self._send_json({'success': False, 'error_code': 'not_found'}, 404)
+
+        endpoint = path[len(API_PREFIX):]
+        self.state.count(f'{method} {re.sub(r"[0-9]+|uuid-webtv-[0-9]+", "*", endpoint)}')
+        if not self._simulate_conditions():
+            return
+        if not self._authenticated(endpoint):
+            return self._auth_required()
+
+        for pattern, handler_method, handler in self.ROUTES:
+            match = re.fullmatch(pattern, endpoint)
+            if match and handler_method == method:
+                return handler(self, body, *match.groups())
+        self._send_json({'success': False, 'error_code': 'not_found', 'msg': 'Endpoint inconnu'}, 404)
+
+    def _send_logo(self):
+        if self.headers.get('If-None-Match') == '"mock-logo"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('ETag', '"mock-logo"')
+        self.send_header('Content-Length', str(len(LOGO_PNG)))
+        self.end_headers()
+        self.wfile.write(LOGO_PNG)
+
+    # Authentification
+
+    def login(self, body):
+        self._success({'logged_in': False, 'challenge': self.state.challenge, 'password_salt': 'salt'})
+
+    def authorize_status(self, body, track_id=None):
+        self._success({'status': self.state.authorize_status, 'challenge': self.state.challenge})
+
+    def authorize(self, body):
+        self._success({'app_token': self.state.app_token, 'track_id': self.state.track_id})
+
+    def session(self, body):
+        expected = hmac.new(self.state.app_token.encode('utf-8'), self.state.challenge.encode('utf-8'),
+                            hashlib.sha1).hexdigest()
+        if body.get('password') != expected:
+            return self._send_json({'success': False, 'error_code': 'invalid_token', 'msg': 'Token invalide'}, 403)
+        self._success({'session_token': self.state.new_session(), 'permissions': {'tv': True, 'pvr': True}})
+
+    # Télévision
+
+    def channels(self, body):
+        self._success(self.state.channels)
+
+    def channel(self, body, channel_uuid):
+        channel = self.state.channels.get(channel_uuid)
+        if channel is None:
+            return self._send_json({'success': False, 'error_code': 'noent'}, 404)
+        self._success(channel)
+
+    def current_program(self, body, channel_uuid):
+        self._success(self.state.program(channel_uuid, int(time.time())))
+
+    def epg_by_time(self, body, timestamp):
+        timestamp = int(timestamp)
+        self._success({
+            channel_uuid: self.state.epg_window(channel_uuid, timestamp)
+            for channel_uuid in self.state.channels
+        })
+
+    def epg_by_channel(self, body, channel_uuid, timestamp):
+        self._success(self.state.epg_window(channel_uuid, int(timestamp), span=86400))
+
+    def bouquet_channels(self, body, bouquet_id):
+        channels = list(self.state.channels.values())[:100]
+        self._success([{'uuid': c['uuid'], 'number': i + 1} for i, c in enumerate(channels)])
+
+    # Enregistrements
+
+    def programmed(self, body):
+        with self.state.lock:
+            self._success(list(self.state.recordings.values()))
+
+    def create_programmed(self, body):
+        with self.state.lock:
+            recording_id = self.state.next_recording_id
+            self.state.next_recording_id += 1
+            channel = self.state.channels.get(body.get('channel_uuid'), {})
+            recording = dict(body, id=recording_id, state='waiting_start',
+                             channel_name=channel.get('name', 'Chaîne inconnue'))
+            self.state.recordings[recording_id] = recording
+        self._success(recording)
+
+    def update_programmed(self, body, recording_id):
+        with self.state.lock:
+            recording = self.state.recordings.get(int(recording_id))
+            if recording is None:
+                return self._send_json({'success': False, 'error_code': 'noent'}, 404)
+            recording.update(body)
+        self._success(recording)
+
+    def delete_programmed(self, body, recording_id):
+        with self.state.lock:
+            self.state.recordings.pop(int(recording_id), None)
+        self._success()
+
+    ROUTES = [
+        (r'login/', 'GET', login),
+        (r'login/authorize/', 'GET', authorize_status),
+        (r'login/authorize/([0-9]+)', 'GET', authorize_status),
+        (r'login/authorize/', 'POST', authorize),
+        (r'login/session/', 'POST', session),
+        (r'tv/channels/', 'GET', channels),
+        (r'tv/channels/([^/]+)/', 'GET', channel),
+        (r'tv/channels/([^/]+)/programs/current/', 'GET', current_program),
+        (r'tv/epg/by_time/([0-9]+)/', 'GET', epg_by_time),
+        (r'tv/epg/by_channel/([^/]+)/([0-9]+)/', 'GET', epg_by_channel),
+        (r'tv/bouquets/([^/]+)/channels/', 'GET', bouquet_channels),
+        (r'pvr/programmed/', 'GET', programmed),
+        (r'pvr/programmed/', 'POST', create_programmed),
+        (r'pvr/programmed/([0-9]+)', 'PUT', update_programmed),
+        (r'pvr/programmed/([0-9]+)', 'DELETE', delete_programmed),
+    ]
+
+
+class MockFreebox:
+    """Serveur simulé démarré dans un thread (utilisable depuis les benchmarks)"""
+
+    def __init__(self, host='127.0.0.1', port=0, **options):
+        self.state = MockFreeboxState(**options)
+        handler = type('BoundMockFreeboxHandler', (MockFreeboxHandler,), {'state': self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{API_PREFIX}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serveur Freebox simulé')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8031)
+    parser.add_argument('--channels', type=int, default=300, help='Nombre de chaînes')
+    parser.add_argument('--latency', type=float, default=0, help='Latence ajoutée (ms)')
+    parser.add_argument('--jitter', type=float, default=0, help='Variation aléatoire de latence (ms)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Proportion de réponses 500')
+    parser.add_argument('--auth-error-rate', type=float, default=0, help='Proportion de sessions expirées (403)')
+    args = parser.parse_args()
+
+    mock = MockFreebox(args.host, args.port, channel_count=args.channels,
+                       latency=args.latency / 1000, jitter=args.jitter / 1000,
+                       error_rate=args.error_rate, auth_error_rate=args.auth_error_rate)
+    print(f"Freebox simulée sur {mock.api_base_url} (app_token: {mock.state.app_token})")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
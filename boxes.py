@@ -0,0 +1,176 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from freebox import atomic_write_json, file_lock
+from scheduler import Scheduler
+
+DEFAULT_BOX = 'default'
+BOX_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+
+class BoxDispatcher:
+    """Middleware WSGI : /box/<nom>/... sert l'application pour la Freebox <nom>
+
+    Le préfixe passe dans SCRIPT_NAME : url_for() et request.script_root
+    produisent alors des liens qui restent sur la même Freebox.
+    """
+
+    PREFIX = re.compile(r'^/box/([A-Za-z0-9_-]{1,32})(/.*)?$')
+    ENVIRON_KEY = 'magneto.box'
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        match = self.PREFIX.match(environ.get('PATH_INFO', ''))
+        if match:
+            name = match.group(1)
+            environ[self.ENVIRON_KEY] = name
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + f'/box/{name}'
+            environ['PATH_INFO'] = match.group(2) or '/'
+        return self.wsgi_app(environ, start_response)
+
+
+class BoxRegistry:
+    """Freebox servies par l'application, chacune avec ses propres ressources
+
+    La Freebox « default » utilise data/config et data/cache ; les autres,
+    déclarées dans data/config/boxes.json, ont leurs credentials, caches et
+    instantanés sous data/boxes/<nom>/. Le service d'une Freebox (pool de
+    connexions, caches, session) est créé à son premier accès puis réutilisé :
+    le coût croît avec le nombre de Freebox, pas avec le nombre de requêtes.
+    """
+
+    HEALTH_CHECK_INTERVAL = 60
+    MAX_WORKERS = 8
+
+    def __init__(self, service_factory, config_dir='data/config', cache_dir='data/cache',
+                 boxes_dir='data/boxes', max_workers=MAX_WORKERS):
+        # service_factory(nom, config_dir, cache_dir, réglages) -> service de la Freebox
+        self.service_factory = service_factory
+        self.config_dir = Path(config_dir)
+        self.config_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = Path(cache_dir)
+        self.boxes_dir = Path(boxes_dir)
+        self.boxes_file = self.config_dir / 'boxes.json'
+        self._lock = threading.Lock()
+        self._services = {}
+        self._boxes = self._load_boxes()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='boxes')
+        # Un seul planificateur : les tâches de chaque Freebox sont groupées sous son nom
+        self.scheduler = Scheduler()
+        self.health = {}
+
+    def _load_boxes(self):
+        try:
+            with open(self.boxes_file, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Erreur lors du chargement des Freebox: {str(e)}")
+            return {}
+        return {
+            name: dict(settings or {})
+            for name, settings in (data.get('boxes') or {}).items()
+            if name != DEFAULT_BOX and BOX_NAME_PATTERN.match(name)
+        }
+
+    def names(self):
+        """Noms des Freebox déclarées, « default » en tête"""
+        with self._lock:
+            return [DEFAULT_BOX] + sorted(self._boxes)
+
+    def paths(self, name):
+        """Répertoires (config, cache) de la Freebox name"""
+        if name == DEFAULT_BOX:
+            return self.config_dir, self.cache_dir
+        box_dir = self.boxes_dir / name
+        return box_dir / 'config', box_dir / 'cache'
+
+    def get(self, name=DEFAULT_BOX):
+        """Service de la Freebox name, créé au premier accès (KeyError si inconnue)"""
+        service = self._services.get(name)
+        if service is not None:
+            return service
+        with self._lock:
+            service = self._services.get(name)
+            if service is not None:
+                return service
+            if name != DEFAULT_BOX and name not in self._boxes:
+                # Freebox ajoutée depuis un autre worker
+                self._boxes = self._load_boxes()
+                if name not in self._boxes:
+                    raise KeyError(name)
+            config_dir, cache_dir = self.paths(name)
+            service = self.service_factory(name, config_dir, cache_dir, self._boxes.get(name, {}))
+            self._services[name] = service
+        if self.scheduler.running:
+            service.schedule(self.scheduler)
+        return service
+
+    def add(self, name, api_base_url):
+        """Déclarer une nouvelle Freebox (enregistrée dans boxes.json)"""
+        if not name or name == DEFAULT_BOX or not BOX_NAME_PATTERN.match(name):
+            raise ValueError(f"Nom de Freebox invalide: {name}")
+        with self._lock, file_lock(self.config_dir / 'boxes.json.lock'):
+            boxes = self._load_boxes()
+            if name in boxes:
+                raise ValueError(f"La Freebox {name} existe déjà")
+            boxes[name] = {'api_base_url': api_base_url}
+            atomic_write_json(self.boxes_file, {'boxes': boxes})
+            self._boxes = boxes
+        return self.get(name)
+
+    def start_scheduler(self):
+        """Planifier les rafraîchissements de toutes les Freebox et leur contrôle de santé"""
+        scheduler = self.scheduler
+        if scheduler.running:
+            return
+        services = [self.get(name) for name in self.names()]
+        for service in services:
+            service.schedule(scheduler)
+        scheduler.add('health', self.check_health, self.HEALTH_CHECK_INTERVAL,
+                      description='Santé des Freebox')
+        # Les Freebox sont rafraîchies en parallèle, pas les unes après les autres
+        scheduler.max_workers = max(Scheduler.MAX_WORKERS, 2 * len(services))
+        scheduler.start()
+
+    def check_health(self):
+        """Contrôler en parallèle toutes les Freebox (joignabilité, latence, session)"""
+        futures = {
+            name: self.executor.submit(lambda name=name: self.get(name).check_health())
+            for name in self.names()
+        }
+        for name, future in futures.items():
+            try:
+                self.health[name] = future.result()
+            except Exception as e:
+                self.health[name] = {'name': name, 'reachable': False, 'error': str(e),
+                                     'checked_at': time.time()}
+        return self.status()
+
+    def status(self):
+        """Freebox déclarées et résultat de leur dernier contrôle de santé"""
+        with self._lock:
+            boxes = [(DEFAULT_BOX, {})] + sorted(self._boxes.items())
+            loaded = set(self._services)
+        return [dict({
+            'name': name,
+            'api_base_url': settings.get('api_base_url'),
+            'loaded': name in loaded,
+            'checked_at': None
+        }, **self.health.get(name, {})) for name, settings in boxes]
+
+    def shutdown(self):
+        """Arrêter le planificateur et les services de toutes les Freebox"""
+        self.scheduler.stop()
+        self.executor.shutdown(wait=False)
+        with self._lock:
+            services = list(self._services.values())
+        for service in services:
+            service.shutdown()
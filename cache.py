@@ -0,0 +1,110 @@
+import threading
+import time
+
+
+class TTLCache:
+    """Cache mémoire à durée de vie, servant les données périmées pendant leur rafraîchissement"""
+
+    def __init__(self, ttl, max_stale=None, on_event=None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        # Appelé avec 'hit', 'stale', 'miss' ou 'refresh_error' (métriques)
+        self.on_event = on_event
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def get(self, key, loader, should_cache=None, ttl=None):
+        """Retourner la valeur en cache ou la charger via loader()
+
+        Une valeur expirée est renvoyée immédiatement et un seul rafraîchissement
+        est lancé en arrière-plan pour la clé concernée.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    self.hits += 1
+                    self._notify('hit')
+                    return value
+                if self.max_stale is None or now < expires_at + self.max_stale:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh,
+                            args=(key, loader, should_cache, ttl),
+                            daemon=True
+                        ).start()
+                    self._notify('stale')
+                    return value
+            self.misses += 1
+
+        self._notify('miss')
+        value = loader()
+        self._store(key, value, should_cache, ttl)
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Insérer une valeur dans le cache"""
+        self._store(key, value, None, ttl)
+
+    def peek(self, key, fresh_only=False):
+        """Retourner la valeur en cache (même expirée, sauf fresh_only) sans la recharger"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (fresh_only and time.monotonic() >= entry[1]):
+                return None
+            return entry[0]
+
+    def invalidate(self, key=None):
+        """Invalider une clé, ou tout le cache si aucune clé n'est fournie"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Compteurs d'utilisation du cache"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refresh_errors': self.refresh_errors,
+                'refreshing': len(self._refreshing)
+            }
+
+    def _notify(self, event):
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def _store(self, key, value, should_cache, ttl):
+        if should_cache is not None and not should_cache(value):
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if callable(ttl):
+            ttl = ttl(value)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+
+    def _refresh(self, key, loader, should_cache, ttl):
+        try:
+            value = loader()
+            self._store(key, value, should_cache, ttl)
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            self._notify('refresh_error')
+            print(f"Erreur lors du rafraîchissement du cache ({key}): {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
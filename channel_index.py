@@ -0,0 +1,160 @@
+import base64
+import bisect
+import json
+
+from epg import fold_text
+
+
+def encode_cursor(key, order):
+    """Curseur de pagination opaque : clé de tri du dernier élément et ordre de tri"""
+    payload = json.dumps({'order': order, 'key': list(key)})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, order):
+    """Clé de tri contenue dans un curseur produit pour l'ordre order
+
+    Lève ValueError si le curseur est invalide ou produit pour un autre ordre de tri.
+    """
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Curseur invalide')
+    if not isinstance(payload, dict) or not isinstance(payload.get('key'), list) or not payload['key']:
+        raise ValueError('Curseur invalide')
+    if payload.get('order') != order:
+        raise ValueError(f"Curseur produit pour un autre ordre de tri que {order}")
+    return tuple(payload['key'])
+
+
+def normalize_logo_url(logo_url, api_base_url):
+    """URL absolue (en HTTP) d'un logo fourni par la Freebox"""
+    if not logo_url:
+        return logo_url
+    if not logo_url.startswith('http'):
+        base = api_base_url.replace('/api/v4/', '').replace('https://', 'http://')
+        return base + logo_url
+    if logo_url.startswith('https://'):
+        return logo_url.replace('https://', 'http://')
+    return logo_url
+
+
+class ChannelRecord:
+    """Chaîne TV sous forme compacte, prête pour l'affichage"""
+
+    __slots__ = ('id', 'name', 'short_name', 'logo', 'logo_source', 'favorite', 'available', 'search_name')
+
+    def __init__(self, channel_data, api_base_url, proxy_logo_url):
+        self.id = channel_data.get('uuid')
+        self.name = channel_data.get('name')
+        self.short_name = channel_data.get('short_name')
+        self.favorite = bool(channel_data.get('favorite', False))
+        self.available = bool(channel_data.get('available', False))
+        # Nom sans accents ni majuscules : tri par nom et filtre par préfixe
+        self.search_name = fold_text(self.name)
+        # Logo d'origine (pour le proxy /logo) et URL locale servie aux pages
+        self.logo_source = normalize_logo_url(channel_data.get('logo_url'), api_base_url)
+        self.logo = proxy_logo_url(self.id) if self.logo_source else None
+
+
+class ChannelIndex:
+    """Vue précalculée de la liste des chaînes Freebox
+
+    Construite une seule fois par version de la liste (réponse tv/channels/) :
+    les logos sont normalisés et les chaînes disponibles triées par UUID, par
+    nom et favoris en tête. Les vues par requête (chaînes sélectionnées...)
+    sont de simples projections de ces listes.
+    """
+
+    # Clés de tri (sérialisables en JSON pour les curseurs de pagination)
+    SORT_KEYS = {
+        'uuid': lambda r: (r.id,),
+        'name': lambda r: (r.search_name, r.id),
+        'favorite': lambda r: (0 if r.favorite else 1, r.search_name, r.id)
+    }
+    ORDERS = tuple(SORT_KEYS)
+
+    def __init__(self, channels_result, api_base_url, proxy_logo_url):
+        # Réponse tv/channels/ d'origine : l'index n'est reconstruit que si elle change
+        self.source = channels_result
+        self.api_base_url = api_base_url
+
+        channels_dict = (channels_result or {}).get('result') or {}
+        records = [ChannelRecord(channel_data, api_base_url, proxy_logo_url)
+                   for channel_data in channels_dict.values() if channel_data.get('uuid')]
+        self.by_id = {record.id: record for record in records}
+
+        available = [record for record in records if record.available]
+        self._orderings = {}
+        self._keys = {}
+        for order, sort_key in self.SORT_KEYS.items():
+            ordering = sorted(available, key=sort_key)
+            self._orderings[order] = tuple(ordering)
+            self._keys[order] = [sort_key(record) for record in ordering]
+        self._ranks = {
+            order: {record.id: rank for rank, record in enumerate(ordering)}
+            for order, ordering in self._orderings.items()
+        }
+        self.favorite_ids = frozenset(record.id for record in available if record.favorite)
+
+    def __len__(self):
+        return len(self._orderings['uuid'])
+
+    def is_current(self, channels_result, api_base_url):
+        """Indiquer si l'index correspond encore à cette liste de chaînes"""
+        return self.source is channels_result and self.api_base_url == api_base_url
+
+    def get(self, channel_id):
+        """Chaîne (disponible ou non) d'UUID channel_id, None si inconnue"""
+        return self.by_id.get(channel_id)
+
+    def ordered(self, order='uuid'):
+        """Chaînes disponibles dans l'ordre demandé (uuid, name ou favorite)"""
+        return self._orderings[order]
+
+    def select(self, channel_ids, order='uuid', available_only=True):
+        """Sous-ensemble trié des chaînes channel_ids
+
+        Le coût dépend du nombre de chaînes demandées, pas de la taille du bouquet.
+        """
+        ranks = self._ranks[order]
+        records = [self.by_id[channel_id] for channel_id in channel_ids if channel_id in self.by_id]
+        if available_only:
+            records = [record for record in records if record.available]
+        records.sort(key=lambda r: ranks.get(r.id, len(ranks)))
+        return records
+
+    def page(self, order='uuid', after=None, limit=50, prefix=None, predicate=None):
+        """Page de chaînes disponibles suivant la clé de tri after
+
+        Retourne (chaînes, clé du dernier élément) ; la clé vaut None s'il n'y
+        a plus rien après. Le curseur reste valable si la liste change entre
+        deux pages. Triée par nom, la recherche par préfixe part directement
+        de la première chaîne concernée.
+        """
+        ordering = self._orderings[order]
+        keys = self._keys[order]
+        try:
+            start = bisect.bisect_right(keys, tuple(after)) if after is not None else 0
+        except TypeError:
+            # Curseur produit pour un autre ordre de tri
+            raise ValueError('Curseur invalide')
+        folded = fold_text(prefix) if prefix else None
+        if folded and order == 'name':
+            start = max(start, bisect.bisect_left(keys, (folded,)))
+
+        records = []
+        for position in range(start, len(ordering)):
+            record = ordering[position]
+            if folded and not record.search_name.startswith(folded):
+                if order == 'name':
+                    break
+                continue
+            if predicate is not None and not predicate(record):
+                continue
+            records.append(record)
+            if len(records) >= limit:
+                return records, keys[position] if position + 1 < len(ordering) else None
+        return records, None
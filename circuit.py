@@ -0,0 +1,109 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """Disjoncteur suivant la santé d'un service distant
+
+    Après failure_threshold échecs consécutifs le circuit s'ouvre : les appels
+    échouent immédiatement. Une seule requête de sonde est autorisée à chaque
+    échéance (état semi-ouvert), avec un délai doublé après chaque sonde ratée.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    FAILURE_THRESHOLD = 3
+    BASE_DELAY = 5
+    MAX_DELAY = 5 * 60
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, base_delay=BASE_DELAY, max_delay=MAX_DELAY,
+                 on_state_change=None):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Appelé avec le nouvel état à chaque transition
+        self.on_state_change = on_state_change
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._open_count = 0
+        self._retry_at = None
+        self._opened_at = None
+        self._last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def is_open(self):
+        """Indiquer si le service est considéré comme injoignable"""
+        with self._lock:
+            return self._state != self.CLOSED
+
+    def allow_request(self):
+        """Indiquer si un appel peut partir (sonde comprise)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() >= self._retry_at:
+                self._set_state(self.HALF_OPEN)
+                return True
+            # Circuit ouvert, ou sonde déjà en cours
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._open_count = 0
+            self._retry_at = None
+            self._opened_at = None
+            self._last_error = None
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = str(error) if error is not None else None
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def retry_in(self):
+        """Secondes avant la prochaine sonde (0 si le circuit est fermé)"""
+        with self._lock:
+            if self._retry_at is None:
+                return 0
+            return max(self._retry_at - time.monotonic(), 0)
+
+    def status(self):
+        """État du disjoncteur, pour l'affichage et le diagnostic"""
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'retry_in': max(self._retry_at - time.monotonic(), 0) if self._retry_at is not None else 0,
+                'open_since': time.time() - (time.monotonic() - self._opened_at) if self._opened_at is not None else None,
+                'last_error': self._last_error
+            }
+
+    def _open(self):
+        # Appelé avec le verrou : backoff exponentiel entre deux sondes
+        delay = min(self.base_delay * (2 ** self._open_count), self.max_delay)
+        self._open_count += 1
+        now = time.monotonic()
+        self._retry_at = now + delay
+        if self._opened_at is None:
+            self._opened_at = now
+        if self._state != self.OPEN:
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state):
+        self._state = state
+        if self.on_state_change is not None:
+            try:
+                self.on_state_change(state)
+            except Exception as e:
+                print(f"Erreur lors du changement d'état du disjoncteur: {str(e)}")
@@ -0,0 +1,460 @@
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+
+FILM_CATEGORY_NAME = 'Film'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold_text(text):
+    """Mettre un texte en minuscules sans accents (« Amélie » -> « amelie »)"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize_title(text):
+    """Découper un titre en tokens normalisés"""
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+class EpgStore:
+    """Stockage local du guide des programmes (EPG) dans une base SQLite indexée"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS programs (
+            id TEXT NOT NULL,
+            channel_uuid TEXT NOT NULL,
+            start INTEGER NOT NULL,
+            end INTEGER NOT NULL,
+            duration INTEGER NOT NULL,
+            title TEXT,
+            sub_title TEXT,
+            category INTEGER,
+            category_name TEXT,
+            description TEXT,
+            picture TEXT,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (channel_uuid, id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_programs_channel_start ON programs (channel_uuid, start);
+        CREATE INDEX IF NOT EXISTS idx_programs_category ON programs (category_name, start);
+        CREATE INDEX IF NOT EXISTS idx_programs_title ON programs (title, start);
+        CREATE TABLE IF NOT EXISTS windows (
+            channel_uuid TEXT NOT NULL,
+            window_start INTEGER NOT NULL,
+            fetched_at INTEGER NOT NULL,
+            PRIMARY KEY (channel_uuid, window_start)
+        );
+    """
+
+    # Index inversé des titres, insensible aux accents, synchronisé par triggers
+    FTS_SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS programs_fts USING fts5(
+            title, sub_title,
+            content='programs', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS programs_ai AFTER INSERT ON programs BEGIN
+            INSERT INTO programs_fts (rowid, title, sub_title) VALUES (new.rowid, new.title, new.sub_title);
+        END;
+        CREATE TRIGGER IF NOT EXISTS programs_ad AFTER DELETE ON programs BEGIN
+            INSERT INTO programs_fts (programs_fts, rowid, title, sub_title)
+            VALUES ('delete', old.rowid, old.title, old.sub_title);
+        END;
+        CREATE TRIGGER IF NOT EXISTS programs_au AFTER UPDATE ON programs BEGIN
+            INSERT INTO programs_fts (programs_fts, rowid, title, sub_title)
+            VALUES ('delete', old.rowid, old.title, old.sub_title);
+            INSERT INTO programs_fts (rowid, title, sub_title) VALUES (new.rowid, new.title, new.sub_title);
+        END;
+    """
+
+    def __init__(self, db_path='data/cache/epg.sqlite'):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self.fts_enabled = True
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+            try:
+                self._create_fts(conn)
+            except sqlite3.OperationalError as e:
+                # SQLite compilé sans FTS5 : recherche par LIKE, plus lente
+                print(f"Index plein texte indisponible: {str(e)}")
+                self.fts_enabled = False
+
+    def _create_fts(self, conn):
+        """Créer l'index plein texte, indexer les programmes déjà stockés et réparer un index incohérent"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'programs_fts'"
+        ).fetchone() is not None
+        if not exists:
+            # Base existante (sans index) : les triggers ne couvrent que les écritures futures,
+            # l'index est donc rempli avec les programmes déjà présents dans la même transaction
+            conn.executescript(
+                'BEGIN IMMEDIATE;' + self.FTS_SCHEMA +
+                "INSERT INTO programs_fts (programs_fts) VALUES ('rebuild'); COMMIT;"
+            )
+            return
+        conn.executescript(self.FTS_SCHEMA)
+        try:
+            conn.execute("INSERT INTO programs_fts (programs_fts, rank) VALUES ('integrity-check', 1)")
+        except sqlite3.DatabaseError as e:
+            # Index créé sans reconstruction par une version précédente : on le reconstruit
+            print(f"Index plein texte incohérent, reconstruction: {str(e)}")
+            with conn:
+                conn.execute("INSERT INTO programs_fts (programs_fts) VALUES ('rebuild')")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def covered_windows(self, channel_ids, fresh_since):
+        """Retourner les couples (chaîne, fenêtre) déjà récupérés après fresh_since"""
+        channel_ids = list(channel_ids)
+        if not channel_ids:
+            return set()
+        placeholders = ','.join('?' * len(channel_ids))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT channel_uuid, window_start FROM windows '
+                f'WHERE fetched_at >= ? AND channel_uuid IN ({placeholders})',
+                [fresh_since, *channel_ids]
+            ).fetchall()
+        return {(row['channel_uuid'], row['window_start']) for row in rows}
+
+    def store_window(self, window_start, channel_ids, programs):
+        """Enregistrer les programmes d'une fenêtre et marquer celle-ci comme couverte"""
+        now = int(time.time())
+        rows = [
+            (
+                str(program['id']), program['channel_uuid'], program['start'], program['end'],
+                program['duration'], program.get('title'), program.get('sub_title'),
+                program.get('category'), program.get('category_name'), program.get('description'),
+                program.get('picture'), now
+            )
+            for program in programs
+        ]
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            # UPSERT plutôt que REPLACE pour conserver le rowid et déclencher les triggers FTS
+            conn.executemany(
+                'INSERT INTO programs (id, channel_uuid, start, end, duration, title, '
+                'sub_title, category, category_name, description, picture, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (channel_uuid, id) DO UPDATE SET start = excluded.start, '
+                'end = excluded.end, duration = excluded.duration, title = excluded.title, '
+                'sub_title = excluded.sub_title, category = excluded.category, '
+                'category_name = excluded.category_name, description = excluded.description, '
+                'picture = excluded.picture, updated_at = excluded.updated_at',
+                rows
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO windows (channel_uuid, window_start, fetched_at) VALUES (?, ?, ?)',
+                [(channel_id, window_start, now) for channel_id in channel_ids]
+            )
+
+    def purge_before(self, timestamp):
+        """Supprimer les programmes terminés et les fenêtres antérieures à timestamp"""
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM programs WHERE end < ?', (timestamp,))
+            conn.execute('DELETE FROM windows WHERE window_start < ?', (timestamp,))
+
+    def query_programs(self, channel_ids=None, start=None, end=None, category_name=None, limit=None):
+        """Rechercher des programmes dans l'EPG local"""
+        clauses, params = [], []
+        if channel_ids is not None:
+            channel_ids = list(channel_ids)
+            if not channel_ids:
+                return []
+            clauses.append(f"channel_uuid IN ({','.join('?' * len(channel_ids))})")
+            params.extend(channel_ids)
+        if category_name is not None:
+            clauses.append('category_name = ?')
+            params.append(category_name)
+        if start is not None:
+            clauses.append('end > ?')
+            params.append(int(start))
+        if end is not None:
+            clauses.append('start < ?')
+            params.append(int(end))
+
+        sql = 'SELECT * FROM programs'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY start, channel_uuid'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def search_programs(self, query=None, channel_ids=None, category_name=None, start=None,
+                        end=None, min_duration=None, max_duration=None, limit=100):
+        """Rechercher des programmes par titre (index inversé) et filtres indexés
+
+        Les durées sont exprimées en secondes. Chaque mot de la requête est
+        recherché comme préfixe, sans tenir compte des accents ni de la casse.
+        """
+        clauses, params = [], []
+        tokens = tokenize_title(query)
+        sql = 'SELECT p.* FROM programs p'
+
+        if tokens and self.fts_enabled:
+            # Le résultat plein texte pilote la requête : sinon SQLite parcourt l'index
+            # de catégorie et évalue MATCH pour chaque programme candidat
+            clauses.append('p.rowid IN (SELECT rowid FROM programs_fts WHERE programs_fts MATCH ?)')
+            params.append(' AND '.join(f'"{token}"*' for token in tokens))
+        elif tokens:
+            for token in tokens:
+                clauses.append('p.title LIKE ?')
+                params.append(f'%{token}%')
+
+        if channel_ids is not None:
+            channel_ids = list(channel_ids)
+            if not channel_ids:
+                return []
+            clauses.append(f"p.channel_uuid IN ({','.join('?' * len(channel_ids))})")
+            params.extend(channel_ids)
+        if category_name:
+            clauses.append('p.category_name = ?')
+            params.append(category_name)
+        if start is not None:
+            clauses.append('p.end > ?')
+            params.append(int(start))
+        if end is not None:
+            clauses.append('p.start < ?')
+            params.append(int(end))
+        if min_duration is not None:
+            clauses.append('p.duration >= ?')
+            params.append(int(min_duration))
+        if max_duration is not None:
+            clauses.append('p.duration <= ?')
+            params.append(int(max_duration))
+
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY p.start, p.channel_uuid LIMIT ?'
+        params.append(int(limit))
+
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def get_programs(self, keys):
+        """Récupérer des programmes par couples (chaîne, identifiant)"""
+        programs = []
+        with closing(self._connect()) as conn:
+            for channel_uuid, program_id in keys:
+                row = conn.execute(
+                    'SELECT * FROM programs WHERE channel_uuid = ? AND id = ?',
+                    (channel_uuid, str(program_id))
+                ).fetchone()
+                if row is not None:
+                    programs.append(dict(row))
+        return programs
+
+    def find_airings(self, title, start, channel_ids=None, limit=20):
+        """Autres diffusions d'un même titre à partir de start"""
+        clauses = ['title = ?', 'start >= ?']
+        params = [title, int(start)]
+        if channel_ids is not None:
+            channel_ids = list(channel_ids)
+            if not channel_ids:
+                return []
+            clauses.append(f"channel_uuid IN ({','.join('?' * len(channel_ids))})")
+            params.extend(channel_ids)
+        params.append(int(limit))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM programs WHERE {' AND '.join(clauses)} ORDER BY start LIMIT ?",
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_categories(self):
+        """Catégories présentes dans l'EPG local"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT DISTINCT category_name FROM programs WHERE category_name IS NOT NULL ORDER BY category_name'
+            ).fetchall()
+        return [row['category_name'] for row in rows]
+
+    def upcoming_films(self, channel_ids, days=7):
+        """Films à venir sur les chaînes données dans les prochains jours"""
+        now = int(time.time())
+        return self.query_programs(channel_ids, start=now, end=now + days * 86400,
+                                   category_name=FILM_CATEGORY_NAME)
+
+
+class EpgIngester:
+    """Alimentation incrémentale de l'EPG local depuis l'API Freebox"""
+
+    WINDOW_SECONDS = 2 * 3600
+    DEFAULT_HORIZON_DAYS = 7
+    DEFAULT_STALE_AFTER = 12 * 3600
+    # En dessous de ce nombre de chaînes, interroger chaque chaîne plutôt que toute la grille
+    BY_CHANNEL_THRESHOLD = 3
+    MAX_WORKERS = 4
+
+    def __init__(self, freebox_api, store, horizon_days=DEFAULT_HORIZON_DAYS,
+                 stale_after=DEFAULT_STALE_AFTER, window_seconds=WINDOW_SECONDS):
+        self.freebox_api = freebox_api
+        self.store = store
+        self.horizon_days = horizon_days
+        self.stale_after = stale_after
+        self.window_seconds = window_seconds
+        self._refresh_lock = threading.Lock()
+
+    def pending_windows(self, channel_ids, now=None):
+        """Fenêtres à (re)télécharger : dictionnaire début de fenêtre -> chaînes concernées"""
+        now = int(now or time.time())
+        first = now - now % self.window_seconds
+        last = now + self.horizon_days * 86400
+        covered = self.store.covered_windows(channel_ids, now - self.stale_after)
+
+        pending = {}
+        for window_start in range(first, last, self.window_seconds):
+            missing = [channel_id for channel_id in channel_ids if (channel_id, window_start) not in covered]
+            if missing:
+                pending[window_start] = missing
+        return pending
+
+    def refresh(self, channel_ids):
+        """Mettre à jour l'EPG local pour les chaînes données, retourne un bilan"""
+        channel_ids = sorted(set(channel_ids))
+        stats = {'windows': 0, 'programs': 0, 'errors': 0}
+        if not channel_ids:
+            return stats
+
+        # Un seul rafraîchissement à la fois
+        with self._refresh_lock:
+            now = int(time.time())
+            pending = self.pending_windows(channel_ids, now)
+            outcomes = {}
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix='epg') as executor:
+                futures = {
+                    window_start: executor.submit(self._fetch_window, window_start, missing)
+                    for window_start, missing in pending.items()
+                }
+                for window_start, future in futures.items():
+                    try:
+                        outcomes[window_start] = future.result()
+                    except Exception as e:
+                        outcomes[window_start] = e
+            return self._store_windows(now, pending, outcomes)
+
+    async def refresh_async(self, async_api, channel_ids):
+        """Variante asyncio de refresh, via un freebox_async.AsyncFreeboxAPI
+
+        Toutes les fenêtres sont demandées en parallèle, dans la limite de
+        concurrence du client, sans thread par appel.
+        """
+        channel_ids = sorted(set(channel_ids))
+        if not channel_ids:
+            return {'windows': 0, 'programs': 0, 'errors': 0}
+
+        # Attendre le verrou hors de la boucle d'événements
+        await asyncio.to_thread(self._refresh_lock.acquire)
+        try:
+            now = int(time.time())
+            pending = self.pending_windows(channel_ids, now)
+            results = await asyncio.gather(
+                *(self._fetch_window_async(async_api, window_start, missing)
+                  for window_start, missing in pending.items()),
+                return_exceptions=True
+            )
+            return self._store_windows(now, pending, dict(zip(pending, results)))
+        finally:
+            self._refresh_lock.release()
+
+    def _store_windows(self, now, pending, outcomes):
+        """Enregistrer les fenêtres téléchargées (ou les erreurs), retourne le bilan"""
+        stats = {'windows': 0, 'programs': 0, 'errors': 0}
+        for window_start, programs in outcomes.items():
+            if isinstance(programs, BaseException):
+                stats['errors'] += 1
+                print(f"Erreur lors de l'ingestion EPG ({window_start}): {str(programs)}")
+                continue
+            self.store.store_window(window_start, pending[window_start], programs)
+            stats['windows'] += 1
+            stats['programs'] += len(programs)
+
+        self.store.purge_before(now - now % self.window_seconds)
+        return stats
+
+    def _fetch_window(self, window_start, channel_ids):
+        """Télécharger les programmes d'une fenêtre pour les chaînes données"""
+        if len(channel_ids) <= self.BY_CHANNEL_THRESHOLD:
+            by_channel = {
+                channel_id: self._result_of(self.freebox_api.get_epg_by_channel(channel_id, window_start))
+                for channel_id in channel_ids
+            }
+        else:
+            by_channel = self._result_of(self.freebox_api.get_epg_by_time(window_start))
+        return self._window_programs(window_start, channel_ids, by_channel)
+
+    async def _fetch_window_async(self, async_api, window_start, channel_ids):
+        if len(channel_ids) <= self.BY_CHANNEL_THRESHOLD:
+            results = await asyncio.gather(
+                *(async_api.get_epg_by_channel(channel_id, window_start) for channel_id in channel_ids)
+            )
+            by_channel = {channel_id: self._result_of(result) for channel_id, result in zip(channel_ids, results)}
+        else:
+            by_channel = self._result_of(await async_api.get_epg_by_time(window_start))
+        return self._window_programs(window_start, channel_ids, by_channel)
+
+    def _window_programs(self, window_start, channel_ids, by_channel):
+        """Programmes normalisés d'une fenêtre, limités aux chaînes demandées"""
+        wanted = set(channel_ids)
+        window_end = window_start + self.window_seconds
+        if not isinstance(by_channel, dict):
+            return []
+
+        programs = []
+        for channel_id, channel_programs in by_channel.items():
+            if channel_id not in wanted:
+                continue
+            if isinstance(channel_programs, dict):
+                channel_programs = channel_programs.values()
+            for program in channel_programs or []:
+                normalized = normalize_program(channel_id, program)
+                if normalized and normalized['start'] < window_end and normalized['end'] > window_start:
+                    programs.append(normalized)
+        return programs
+
+    @staticmethod
+    def _result_of(response):
+        if not response or not response.get('success'):
+            raise Exception(response.get('msg', 'Réponse EPG invalide') if response else "Pas de réponse de l'API")
+        return response.get('result') or {}
+
+
+def normalize_program(channel_id, program):
+    """Convertir un programme de l'API Freebox au format du stockage local"""
+    if not isinstance(program, dict) or not program.get('id') or not program.get('date'):
+        return None
+    start = int(program['date'])
+    duration = int(program.get('duration') or 0)
+    return {
+        'id': program['id'],
+        'channel_uuid': channel_id,
+        'start': start,
+        'end': start + duration,
+        'duration': duration,
+        'title': program.get('title'),
+        'sub_title': program.get('sub_title'),
+        'category': program.get('category'),
+        'category_name': program.get('category_name'),
+        'description': program.get('desc') or program.get('short_desc'),
+        'picture': program.get('picture_big') or program.get('picture')
+    }
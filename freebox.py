@@ -1,22 +1,239 @@
 import requests
+from requests.adapters import HTTPAdapter
 import hmac
 import hashlib
 from datetime import datetime
 import json
+import os
+import tempfile
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from cache import TTLCache
+from circuit import CircuitBreaker
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus sur fichier
+    fcntl = None
+
+
+def atomic_write_json(path, data):
+    """Écrire un fichier JSON de façon atomique (fichier temporaire + renommage)"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Verrou exclusif inter-processus sur un fichier .lock (sans effet sans fcntl)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class SharedResponse:
+    """Réponse HTTP déjà lue, partagée par les appelants d'un même GET
+
+    Le corps n'est lu qu'une fois ; chaque appelant reçoit sa propre vue
+    (copy) et décode son propre JSON, qu'il peut modifier sans effet sur
+    les autres.
+    """
+
+    __slots__ = ('status_code', 'content', 'headers', '_json')
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.content = response.content
+        self.headers = response.headers
+        self._json = None
+
+    def copy(self):
+        """Vue distincte sur la même réponse, pour un autre appelant"""
+        return SharedResponse(self)
+
+    def json(self):
+        if self._json is None:
+            self._json = json.loads(self.content)
+        return self._json
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+
+class InFlightCall:
+    """Appel en cours, attendu par les requêtes identiques arrivées entre-temps"""
+
+    __slots__ = ('done', 'response', 'error', 'write_seq')
+
+    def __init__(self, write_seq=0):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        # Écritures sur la ressource déjà terminées au lancement de l'appel
+        self.write_seq = write_seq
+
+    def result(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise Exception(f"Erreur de connexion à l'API Freebox: pas de réponse après {timeout:g} s")
+        if self.error is not None:
+            raise self.error
+        return self.response.copy()
+
+
+class FreeboxUnavailableError(Exception):
+    """La Freebox est considérée injoignable (circuit ouvert) : appel non tenté"""
+
 
 class FreeboxAPI:
     """Classe pour interagir avec l'API Freebox"""
     
-    def __init__(self, api_base_url, app_token=None, session_token=None):
+    # Délai de lecture ; l'établissement de connexion a son propre délai, plus court
+    DEFAULT_TIMEOUT = 10
+    DEFAULT_CONNECT_TIMEOUT = 3
+    DEFAULT_POOL_SIZE = 10
+    POOL_HOSTS = 4
+    DEFAULT_CHANNELS_TTL = 6 * 3600
+    DEFAULT_PROGRAM_TTL = 60
+    DEFAULT_BULK_WORKERS = 8
+    # Les sessions Freebox expirent après une période d'inactivité
+    DEFAULT_SESSION_LIFETIME = 30 * 60
+    SESSION_REFRESH_MARGIN = 2 * 60
+    SESSION_RETRY_DELAY = 5
+    # Attente maximale d'un bail tenu par un autre worker (secondes)
+    SHARED_LEASE_TIMEOUT = 30
+
+    def __init__(self, api_base_url, app_token=None, session_token=None,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 channels_ttl=DEFAULT_CHANNELS_TTL, session_lifetime=DEFAULT_SESSION_LIFETIME,
+                 shared_state=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT, breaker=None,
+                 snapshot=None, bulk_workers=DEFAULT_BULK_WORKERS, box='default'):
         self.api_base_url = api_base_url
+        # Nom de la Freebox, étiquette de ses métriques
+        self.box = box
         self.app_token = app_token
         self.session_token = session_token
         self.app_id = "fr.freebox.magneto_freebox"
         self.app_name = "Magneto Freebox"
         self.app_version = "1.0"
         self.device_name = "MagnetoFreebox"
-        
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_size = pool_size
+        self.http = self._create_http_session()
+        self.channels_cache = TTLCache(ttl=channels_ttl, on_event=metrics.cache_event_recorder(box, 'tv_channels'))
+        # Programmes en cours : valables jusqu'à leur heure de fin, jamais servis périmés
+        self.programs_cache = TTLCache(ttl=self._program_ttl, max_stale=0,
+                                       on_event=metrics.cache_event_recorder(box, 'current_programs'))
+        # Pool des appels en masse (programmes en cours) : taille fixe, créé au premier appel sous verrou
+        self.bulk_workers = bulk_workers
+        self._bulk_executor = None
+        self._bulk_lock = threading.Lock()
+        # État partagé entre workers (mode production), voir shared_state.SharedState
+        self.shared_state = shared_state
+        # Dernière liste de chaînes connue sur disque, voir snapshot.SnapshotStore
+        self.snapshot = snapshot
+        self.session_lifetime = session_lifetime
+        self._session_lock = threading.Lock()
+        # GET en cours par (endpoint, session) : les appels identiques simultanés les attendent
+        self._in_flight = {}
+        # Écritures terminées par ressource (pvr, tv...) : un GET lancé avant n'est plus partagé
+        self._write_seqs = {}
+        self._in_flight_lock = threading.Lock()
+        self._session_last_used = None
+        self._renew_failure = None
+        # Appelé avec le nouveau token après chaque renouvellement automatique
+        self.on_session_refreshed = None
+        # Échecs réseau consécutifs : les appels échouent immédiatement tant que le circuit est ouvert
+        self.breaker = breaker or CircuitBreaker(
+            on_state_change=lambda state: metrics.freebox_circuit_transitions.inc(box, state)
+        )
+
+    def _create_http_session(self):
+        """Créer la session HTTP persistante (keep-alive) avec son pool de connexions"""
+        session = requests.Session()
+        session.verify = False
+        # Un pool par hôte et schéma : l'API (https) et les logos (http) ne s'évincent pas
+        adapter = HTTPAdapter(pool_connections=self.POOL_HOSTS, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        """Fermer les connexions du pool"""
+        with self._bulk_lock:
+            executor, self._bulk_executor = self._bulk_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if self.http is not None:
+            self.http.close()
+            self.http = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_pool_stats(self):
+        """Statistiques de réutilisation des connexions du pool"""
+        stats = {'requests': 0, 'connections': 0, 'reused': 0, 'pools': 0}
+        if self.http is None:
+            return stats
+
+        adapters = {id(adapter): adapter for adapter in self.http.adapters.values()}
+        for adapter in adapters.values():
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                stats['pools'] += 1
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+
+        stats['reused'] = max(stats['requests'] - stats['connections'], 0)
+        return stats
+
+    def is_degraded(self):
+        """Indiquer si la Freebox est injoignable (les données en cache doivent être servies)"""
+        return self.breaker.is_open()
+
+    def _timeouts(self, timeout=None):
+        """Couple (connexion, lecture) passé à requests"""
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.connect_timeout, timeout if timeout is not None else self.timeout)
+
+    def _check_circuit(self, method, endpoint_label):
+        if not self.breaker.allow_request():
+            metrics.freebox_errors.inc(self.box, method, endpoint_label, 'circuit_open')
+            raise FreeboxUnavailableError(
+                f"Freebox injoignable, nouvel essai dans {int(self.breaker.retry_in()) + 1} s"
+            )
+
     def set_tokens(self, app_token=None, session_token=None):
         """Mettre à jour les tokens"""
         if app_token:
@@ -24,30 +241,188 @@ class FreeboxAPI:
         if session_token:
             self.session_token = session_token
     
-    def _make_request(self, method, endpoint, data=None, use_session=True):
-        """Effectuer une requête à l'API Freebox"""
+    def _make_request(self, method, endpoint, data=None, use_session=True, timeout=None, retry_auth=True):
+        """Effectuer une requête à l'API Freebox
+
+        Les requêtes authentifiées renouvellent la session avant son expiration
+        et sont rejouées une fois si la Freebox répond auth_required. Les GET
+        identiques simultanés (même endpoint, même session) partagent un seul
+        appel, oublié dès qu'il est terminé, sauf si une écriture sur la même
+        ressource s'est terminée depuis son lancement.
+        """
+        method = method.upper()
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError(f"Méthode {method} non supportée")
+        resource = endpoint.split('/', 1)[0]
+        if method != 'GET':
+            try:
+                return self._request(method, endpoint, data, use_session, timeout, retry_auth)
+            finally:
+                with self._in_flight_lock:
+                    self._write_seqs[resource] = self._write_seqs.get(resource, 0) + 1
+
+        key = (endpoint, self.session_token if use_session else None, use_session, retry_auth)
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            write_seq = self._write_seqs.get(resource, 0)
+            leader = call is None or call.write_seq != write_seq
+            if leader:
+                call = self._in_flight[key] = InFlightCall(write_seq)
+        if not leader:
+            metrics.freebox_coalesced.inc(self.box, metrics.normalize_endpoint(endpoint))
+            # Le délai de l'appelant s'applique aussi à l'attente de l'appel partagé
+            return call.result(timeout=sum(self._timeouts(timeout)))
+
+        try:
+            call.response = SharedResponse(self._request(method, endpoint, data, use_session, timeout, retry_auth))
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                if self._in_flight.get(key) is call:
+                    del self._in_flight[key]
+            call.done.set()
+        return call.response.copy()
+
+    def _request(self, method, endpoint, data, use_session, timeout, retry_auth):
+        """Requête proprement dite, avec renouvellement de session et rejeu"""
+        if use_session and self.session_token and self._session_expiring():
+            self.renew_session(self.session_token)
+
+        session_token = self.session_token if use_session else None
+        response = self._send(method, endpoint, data, session_token, timeout)
+
+        if use_session and retry_auth and self._is_auth_required(response) and self.app_token:
+            if self.renew_session(session_token):
+                metrics.freebox_retries.inc(self.box, method, metrics.normalize_endpoint(endpoint))
+                response = self._send(method, endpoint, data, self.session_token, timeout)
+
+        if use_session and response.status_code < 400:
+            self._session_last_used = time.monotonic()
+        return response
+
+    def _send(self, method, endpoint, data, session_token, timeout):
+        """Envoyer la requête HTTP via le pool de connexions"""
         url = f"{self.api_base_url}{endpoint}"
         headers = {}
-        
-        if use_session and self.session_token:
-            headers['X-Fbx-App-Auth'] = self.session_token
-        
+
+        if session_token:
+            headers['X-Fbx-App-Auth'] = session_token
+
+        if self.http is None:
+            self.http = self._create_http_session()
+
+        endpoint_label = metrics.normalize_endpoint(endpoint)
+        self._check_circuit(method, endpoint_label)
+        metrics.count_upstream_call()
+        start = time.perf_counter()
         try:
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, timeout=10, verify=False)
-            elif method.upper() == 'POST':
-                response = requests.post(url, json=data, headers=headers, timeout=10, verify=False)
-            else:
-                raise ValueError(f"Méthode {method} non supportée")
-            
-            return response
+            response = self.http.request(
+                method,
+                url,
+                json=data if method in ('POST', 'PUT') else None,
+                headers=headers,
+                timeout=self._timeouts(timeout)
+            )
         except requests.exceptions.RequestException as e:
+            kind = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'connection'
+            metrics.freebox_errors.inc(self.box, method, endpoint_label, kind)
+            self.breaker.record_failure(e)
             raise Exception(f"Erreur de connexion à l'API Freebox: {str(e)}")
-    
-    def get_auth_status(self):
-        """Vérifier le statut d'authentification"""
+        finally:
+            metrics.freebox_request_duration.observe(time.perf_counter() - start, self.box, method, endpoint_label)
+
+        metrics.freebox_responses.inc(self.box, method, endpoint_label, str(response.status_code))
+        # Une erreur 5xx signale une Freebox en difficulté (redémarrage en cours...)
+        if response.status_code >= 500:
+            self.breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.breaker.record_success()
+        return response
+
+    @staticmethod
+    def _is_auth_required(response):
+        if response.status_code != 403:
+            return False
+        try:
+            return response.json().get('error_code') == 'auth_required'
+        except ValueError:
+            return False
+
+    def _session_expiring(self):
+        """Indiquer si la session est sur le point d'expirer faute d'activité"""
+        if self._session_last_used is None or not self.app_token:
+            return False
+        return time.monotonic() - self._session_last_used > self.session_lifetime - self.SESSION_REFRESH_MARGIN
+
+    def renew_session(self, expired_token):
+        """Renouveler la session une seule fois pour tous les appelants concurrents
+
+        Si un autre thread a déjà remplacé expired_token pendant l'attente du
+        verrou, son résultat est réutilisé sans nouvel échange avec la Freebox.
+        """
+        with self._session_lock:
+            if self.session_token != expired_token and self.session_token:
+                return True
+            # Ne pas relancer immédiatement un échange qui vient d'échouer pour ce token
+            if self._renew_failure is not None:
+                failed_token, failed_at = self._renew_failure
+                if failed_token == expired_token and time.monotonic() - failed_at < self.SESSION_RETRY_DELAY:
+                    return False
+            if self.shared_state is not None:
+                # Un seul worker renouvelle la session, les autres reprennent son token
+                with self.shared_state.lease('session_refresh', timeout=self.SHARED_LEASE_TIMEOUT) as acquired:
+                    shared_token = self.shared_state.get('session_token')
+                    if shared_token and shared_token != expired_token:
+                        self.session_token = shared_token
+                        self._session_last_used = time.monotonic()
+                        return True
+                    if acquired:
+                        result = self._try_refresh_session()
+                        if result and result.get('success'):
+                            self.shared_state.set('session_token', self.session_token)
+                    else:
+                        # Un autre worker renouvelle encore : ne pas invalider sa session
+                        print("Renouvellement de session en cours dans un autre worker")
+                        result = None
+            else:
+                result = self._try_refresh_session()
+            if not result or not result.get('success'):
+                metrics.freebox_session_renewals.inc(self.box, 'failure')
+                self._renew_failure = (expired_token, time.monotonic())
+                return False
+            metrics.freebox_session_renewals.inc(self.box, 'success')
+            self._renew_failure = None
+
+        if self.on_session_refreshed is not None:
+            try:
+                self.on_session_refreshed(self.session_token)
+            except Exception as e:
+                print(f"Erreur lors de l'enregistrement de la nouvelle session: {str(e)}")
+        return True
+
+    def download(self, url, headers=None, timeout=None):
+        """Télécharger une ressource brute (logo...) via le pool de connexions"""
+        if self.http is None:
+            self.http = self._create_http_session()
+        self._check_circuit('GET', 'download')
         try:
-            response = self._make_request('GET', 'login/authorize/', use_session=False)
+            response = self.http.get(url, headers=headers or {}, timeout=self._timeouts(timeout))
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure(e)
+            raise Exception(f"Erreur lors du téléchargement de {url}: {str(e)}")
+        if response.status_code >= 500:
+            self.breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get_auth_status(self, track_id=None):
+        """Vérifier le statut d'authentification (de la demande track_id si fourni)"""
+        endpoint = f'login/authorize/{track_id}' if track_id is not None else 'login/authorize/'
+        try:
+            response = self._make_request('GET', endpoint, use_session=False)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -102,6 +477,13 @@ class FreeboxAPI:
         except Exception as e:
             raise Exception(f"Erreur lors de la création de session: {str(e)}")
     
+    def _try_refresh_session(self):
+        try:
+            return self.refresh_session()
+        except Exception as e:
+            print(f"Échec du rafraîchissement de session: {str(e)}")
+            return None
+
     def refresh_session(self):
         """Rafraîchir la session en utilisant le app_token stocké (sans interaction utilisateur)"""
         if not self.app_token:
@@ -116,17 +498,100 @@ class FreeboxAPI:
 
         if session_result and session_result.get('success'):
             self.session_token = session_result['result']['session_token']
+            self._session_last_used = time.monotonic()
 
         return session_result
 
-    def get_tv_channels(self):
-        """Récupérer la liste des chaînes TV"""
+    def get_tv_channels(self, force_refresh=False):
+        """Récupérer la liste des chaînes TV (via le cache partagé)"""
+        if force_refresh:
+            self.invalidate_tv_channels()
+        try:
+            return self.channels_cache.get(
+                'tv_channels',
+                self._load_tv_channels,
+                should_cache=lambda result: bool(result and result.get('success'))
+            )
+        except Exception as e:
+            # Freebox injoignable sans liste en mémoire : servir le dernier instantané
+            if not self.warm_start():
+                raise
+            print(f"Liste des chaînes servie depuis l'instantané: {str(e)}")
+            return self.channels_cache.peek('tv_channels')
+
+    def warm_start(self):
+        """Précharger la liste des chaînes depuis le dernier instantané sur disque
+
+        L'entrée est insérée déjà expirée : elle est servie immédiatement et
+        rafraîchie en arrière-plan au premier appel de get_tv_channels.
+        """
+        if self.snapshot is None:
+            return False
+        saved = self.snapshot.load('tv_channels')
+        if saved is None:
+            return False
+        self.channels_cache.set('tv_channels', saved[0], ttl=0)
+        return True
+
+    def refresh_tv_channels(self):
+        """Recharger la liste des chaînes sans vider le cache (rafraîchissement planifié)"""
+        result = self._load_tv_channels()
+        if not result or not result.get('success'):
+            raise Exception(result.get('msg', 'Impossible de récupérer les chaînes') if result else "Pas de réponse de l'API")
+        self.channels_cache.set('tv_channels', result)
+        return result
+
+    def ensure_session(self):
+        """Renouveler la session avant son expiration (ou si elle n'existe pas encore)"""
+        if not self.app_token:
+            return False
+        if self.session_token and not self._session_expiring():
+            return True
+        if not self.renew_session(self.session_token):
+            raise Exception("Échec du renouvellement de la session")
+        return True
+
+    def invalidate_tv_channels(self):
+        """Forcer le rechargement de la liste des chaînes au prochain appel"""
+        self.channels_cache.invalidate('tv_channels')
+        if self.shared_state is not None:
+            self.shared_state.delete('tv_channels')
+
+    def _load_tv_channels(self):
+        """Charger la liste des chaînes, via l'état partagé entre workers s'il existe"""
+        if self.shared_state is None:
+            return self._fetch_tv_channels()
+
+        max_age = self.channels_cache.ttl
+        cached = self.shared_state.get('tv_channels', max_age=max_age)
+        if cached is not None:
+            return cached
+        # Un seul worker interroge la Freebox, les autres attendent son résultat
+        with self.shared_state.lease('tv_channels_refresh', timeout=self.SHARED_LEASE_TIMEOUT) as acquired:
+            cached = self.shared_state.get('tv_channels', max_age=max_age)
+            if cached is not None:
+                return cached
+            if not acquired:
+                # Le worker qui tient le bail n'a pas fini : reprendre la dernière liste partagée
+                cached = self.shared_state.get('tv_channels')
+                if cached is not None:
+                    return cached
+                return {'success': False, 'msg': 'Liste des chaînes en cours de rafraîchissement par un autre worker'}
+            result = self._fetch_tv_channels()
+            if result and result.get('success'):
+                self.shared_state.set('tv_channels', result)
+            return result
+
+    def _fetch_tv_channels(self):
+        """Télécharger la liste des chaînes TV depuis la Freebox"""
         try:
             response = self._make_request('GET', 'tv/channels/')
             if response.status_code == 200:
                 result = response.json()
                 # Vérifier que le résultat est un dictionnaire avec la structure attendue
                 if isinstance(result, dict) and result.get('success') is not None:
+                    if result.get('success') and self.snapshot is not None:
+                        self.snapshot.save('tv_channels', result)
                     return result
                 else:
                     # Si ce n'est pas la structure attendue, retourner une erreur standard
@@ -149,6 +614,16 @@ class FreeboxAPI:
         except Exception as e:
             raise Exception(f"Erreur lors de la récupération des infos de la chaîne: {str(e)}")
     
+    def get_bouquet_channels(self, bouquet_id):
+        """Récupérer les chaînes d'un bouquet"""
+        try:
+            response = self._make_request('GET', f'tv/bouquets/{bouquet_id}/channels/')
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            raise Exception(f"Erreur lors de la récupération du bouquet: {str(e)}")
+
     def get_current_program(self, channel_id):
         """Récupérer le programme en cours sur une chaîne"""
         try:
@@ -169,6 +644,102 @@ class FreeboxAPI:
         except Exception as e:
             raise Exception(f"Erreur lors de la récupération du programme en cours: {str(e)}")
 
+    def get_epg_by_time(self, timestamp):
+        """Récupérer le guide des programmes de toutes les chaînes à partir d'un instant"""
+        try:
+            response = self._make_request('GET', f'tv/epg/by_time/{int(timestamp)}/')
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            raise Exception(f"Erreur lors de la récupération de l'EPG: {str(e)}")
+
+    def get_epg_by_channel(self, channel_id, timestamp):
+        """Récupérer le guide des programmes d'une chaîne à partir d'un instant"""
+        try:
+            response = self._make_request('GET', f'tv/epg/by_channel/{channel_id}/{int(timestamp)}/')
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            raise Exception(f"Erreur lors de la récupération de l'EPG de la chaîne: {str(e)}")
+
+    def get_programmed_recordings(self):
+        """Récupérer la liste des enregistrements programmés"""
+        try:
+            response = self._make_request('GET', 'pvr/programmed/')
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            raise Exception(f"Erreur lors de la récupération des programmations: {str(e)}")
+
+    def create_recording(self, recording):
+        """Programmer un enregistrement"""
+        try:
+            response = self._make_request('POST', 'pvr/programmed/', recording)
+            if response.status_code == 200:
+                return response.json()
+            try:
+                return response.json()
+            except ValueError:
+                return None
+        except Exception as e:
+            raise Exception(f"Erreur lors de la programmation de l'enregistrement: {str(e)}")
+
+    def _get_bulk_executor(self):
+        with self._bulk_lock:
+            if self._bulk_executor is None:
+                self._bulk_executor = ThreadPoolExecutor(max_workers=self.bulk_workers,
+                                                         thread_name_prefix='freebox-bulk')
+            return self._bulk_executor
+
+    def get_current_programs(self, channel_ids):
+        """Récupérer en parallèle le programme en cours de plusieurs chaînes
+
+        Chaque programme est mis en cache jusqu'à son heure de fin. Retourne un
+        dictionnaire uuid -> programme (None si indisponible).
+        """
+        channel_ids = list(dict.fromkeys(channel_ids))
+        if not channel_ids:
+            return {}
+
+        executor = self._get_bulk_executor()
+        futures = {
+            channel_id: executor.submit(
+                contextvars.copy_context().run, self._get_cached_current_program, channel_id
+            )
+            for channel_id in channel_ids
+        }
+        programs = {}
+        for channel_id, future in futures.items():
+            try:
+                programs[channel_id] = future.result()
+            except Exception as e:
+                print(f"Erreur programme en cours ({channel_id}): {str(e)}")
+                programs[channel_id] = None
+        return programs
+
+    def _get_cached_current_program(self, channel_id):
+        """Programme en cours d'une chaîne, via le cache par chaîne"""
+        result = self.programs_cache.get(
+            channel_id,
+            lambda: self.get_current_program(channel_id),
+            should_cache=lambda result: bool(result and result.get('success'))
+        )
+        if result and result.get('success'):
+            return result.get('result') or None
+        return None
+
+    def _program_ttl(self, result):
+        """Durée de validité d'un programme en cours : jusqu'à sa fin"""
+        program = result.get('result') or {}
+        start = program.get('date')
+        duration = program.get('duration')
+        if not start or not duration:
+            return self.DEFAULT_PROGRAM_TTL
+        return max(start + duration - time.time(), 1)
+
 class FreeboxConfig:
     """Classe pour gérer la configuration et les credentials Freebox"""
     
@@ -176,30 +747,59 @@ class FreeboxConfig:
         self.config_dir = Path(config_dir)
         self.config_dir.mkdir(parents=True, exist_ok=True)
         self.config_file = self.config_dir / 'freebox.json'
-    
-    def load_credentials(self):
-        """Charger les credentials depuis le fichier"""
-        if not self.config_file.exists():
-            return self._get_default_credentials()
-        
+        self._lock = threading.Lock()
+        self._cached_credentials = None
+        self._cached_signature = None
+
+    def _file_signature(self):
+        """Signature (inode, mtime, taille) du fichier, None s'il n'existe pas"""
         try:
-            with open(self.config_file, 'r') as f:
-                data = json.load(f)
+            stat = self.config_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def is_stale(self):
+        """Indiquer si le fichier a changé depuis le dernier chargement"""
+        with self._lock:
+            return self._cached_credentials is None or self._file_signature() != self._cached_signature
+
+    def load_credentials(self):
+        """Charger les credentials (depuis le cache mémoire si le fichier n'a pas changé)"""
+        with self._lock:
+            signature = self._file_signature()
+            if self._cached_credentials is not None and signature == self._cached_signature:
+                return dict(self._cached_credentials)
+
+            if signature is None:
+                return self._get_default_credentials()
+
+            try:
+                with open(self.config_file, 'r') as f:
+                    data = json.load(f)
                 # S'assurer que tous les champs existent
-                return self._get_default_credentials(data)
-        except Exception as e:
-            print(f"Erreur lors du chargement des credentials: {str(e)}")
-            return self._get_default_credentials()
-    
+                credentials = self._get_default_credentials(data)
+            except Exception as e:
+                print(f"Erreur lors du chargement des credentials: {str(e)}")
+                return self._get_default_credentials()
+
+            self._cached_credentials = dict(credentials)
+            self._cached_signature = signature
+            return credentials
+
     def save_credentials(self, credentials):
-        """Sauvegarder les credentials"""
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(credentials, f, indent=2)
+        """Sauvegarder les credentials (écriture atomique)"""
+        with self._lock, file_lock(self.config_dir / 'freebox.json.lock'):
+            try:
+                atomic_write_json(self.config_file, credentials)
+            except Exception as e:
+                print(f"Erreur lors de la sauvegarde des credentials: {str(e)}")
+                self._cached_credentials = None
+                return False
+
+            self._cached_credentials = dict(credentials)
+            self._cached_signature = self._file_signature()
             return True
-        except Exception as e:
-            print(f"Erreur lors de la sauvegarde des credentials: {str(e)}")
-            return False
     
     def _get_default_credentials(self, existing_data=None):
         """Retourner les credentials par défaut"""
@@ -219,4 +819,4 @@ class FreeboxConfig:
                     existing_data[key] = value
             return existing_data
         
-        return default
\ No newline at end of file
+        return default
@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+import metrics
+from freebox import FreeboxAPI
+
+try:
+    import aiohttp
+except ImportError:  # Dépendance optionnelle : pip install aiohttp
+    aiohttp = None
+
+
+def async_available():
+    """Indiquer si le client asynchrone peut être utilisé (aiohttp installé)"""
+    return aiohttp is not None
+
+
+class AsyncResponse:
+    """Réponse HTTP déjà lue, avec l'interface des réponses requests utilisée par FreeboxAPI"""
+
+    __slots__ = ('status_code', 'content')
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+
+class AsyncFreeboxAPI:
+    """Variante asyncio de FreeboxAPI
+
+    Partage avec le client synchrone sync_api les tokens, le disjoncteur et les
+    caches (chaînes, programmes en cours) : une session renouvelée par l'un sert
+    immédiatement à l'autre. Le nombre d'appels simultanés est limité par
+    concurrency, sans thread par appel.
+    """
+
+    DEFAULT_CONCURRENCY = 32
+
+    def __init__(self, sync_api, concurrency=DEFAULT_CONCURRENCY):
+        if aiohttp is None:
+            raise ImportError("Le client asynchrone nécessite aiohttp (pip install aiohttp)")
+        self.sync_api = sync_api
+        self.concurrency = concurrency
+        # Créés dans la boucle d'événements au premier appel
+        self._http = None
+        self._semaphore = None
+        self._renew_lock = None
+
+    @property
+    def api_base_url(self):
+        return self.sync_api.api_base_url
+
+    @property
+    def app_token(self):
+        return self.sync_api.app_token
+
+    @property
+    def session_token(self):
+        return self.sync_api.session_token
+
+    def _get_http(self):
+        """Session aiohttp persistante (keep-alive) et limites de concurrence"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, ssl=False),
+                timeout=self._client_timeout()
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._renew_lock = asyncio.Lock()
+        return self._http
+
+    def _client_timeout(self, timeout=None):
+        connect, read = self.sync_api._timeouts(timeout)
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    async def close(self):
+        """Fermer les connexions"""
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _make_request(self, method, endpoint, data=None, use_session=True, timeout=None, retry_auth=True):
+        """Effectuer une requête à l'API Freebox (mêmes règles que FreeboxAPI._make_request)"""
+        method = method.upper()
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError(f"Méthode {method} non supportée")
+        self._get_http()
+        api = self.sync_api
+
+        if use_session and api.session_token and api._session_expiring():
+            await self.renew_session(api.session_token)
+
+        session_token = api.session_token if use_session else None
+        response = await self._send(method, endpoint, data, session_token, timeout)
+
+        if use_session and retry_auth and FreeboxAPI._is_auth_required(response) and api.app_token:
+            if await self.renew_session(session_token):
+                metrics.freebox_retries.inc(self.sync_api.box, method, metrics.normalize_endpoint(endpoint))
+                response = await self._send(method, endpoint, data, api.session_token, timeout)
+
+        if use_session and response.status_code < 400:
+            api._session_last_used = time.monotonic()
+        return response
+
+    async def _send(self, method, endpoint, data, session_token, timeout):
+        """Envoyer la requête HTTP, dans la limite de concurrency appels simultanés"""
+        url = f"{self.api_base_url}{endpoint}"
+        headers = {}
+
+        if session_token:
+            headers['X-Fbx-App-Auth'] = session_token
+
+        http = self._get_http()
+        breaker = self.sync_api.breaker
+        endpoint_label = metrics.normalize_endpoint(endpoint)
+        async with self._semaphore:
+            self.sync_api._check_circuit(method, endpoint_label)
+            metrics.count_upstream_call()
+            start = time.perf_counter()
+            try:
+                async with http.request(
+                    method,
+                    url,
+                    json=data if method in ('POST', 'PUT') else None,
+                    headers=headers,
+                    # Toujours explicite : timeout=None désactiverait le délai de la session
+                    timeout=self._client_timeout(timeout)
+                ) as response:
+                    status = response.status
+                    content = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                kind = 'timeout' if isinstance(e, asyncio.TimeoutError) else 'connection'
+                metrics.freebox_errors.inc(self.sync_api.box, method, endpoint_label, kind)
+                breaker.record_failure(e)
+                raise Exception(f"Erreur de connexion à l'API Freebox: {str(e) or type(e).__name__}")
+            finally:
+                metrics.freebox_request_duration.observe(time.perf_counter() - start, self.sync_api.box, method, endpoint_label)
+
+        metrics.freebox_responses.inc(self.sync_api.box, method, endpoint_label, str(status))
+        if status >= 500:
+            breaker.record_failure(f"HTTP {status}")
+        else:
+            breaker.record_success()
+        return AsyncResponse(status, content)
+
+    async def renew_session(self, expired_token):
+        """Renouveler la session une seule fois pour toutes les tâches concurrentes
+
+        L'échange lui-même passe par le client synchrone, qui coordonne aussi
+        les threads et les workers et enregistre le nouveau token.
+        """
+        self._get_http()
+        async with self._renew_lock:
+            if self.sync_api.session_token != expired_token and self.sync_api.session_token:
+                return True
+            return await asyncio.to_thread(self.sync_api.renew_session, expired_token)
+
+    async def _call(self, method, endpoint, error_message, data=None, use_session=True):
+        """Appel retournant la réponse JSON (None si le code HTTP n'est pas 200)"""
+        try:
+            response = await self._make_request(method, endpoint, data, use_session=use_session)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            raise Exception(f"{error_message}: {str(e)}")
+
+    async def get_auth_status(self, track_id=None):
+        """Vérifier le statut d'authentification (de la demande track_id si fourni)"""
+        endpoint = f'login/authorize/{track_id}' if track_id is not None else 'login/authorize/'
+        return await self._call('GET', endpoint, "Erreur lors de la vérification du statut", use_session=False)
+
+    async def request_authorization(self):
+        """Demander une autorisation à la Freebox"""
+        api = self.sync_api
+        return await self._call('POST', 'login/authorize/', "Erreur lors de la demande d'autorisation", {
+            'app_id': api.app_id,
+            'app_name': api.app_name,
+            'app_version': api.app_version,
+            'device_name': api.device_name
+        }, use_session=False)
+
+    async def get_challenge(self):
+        """Récupérer le challenge pour la création de session"""
+        return await self._call('GET', 'login/', "Erreur lors de la récupération du challenge", use_session=False)
+
+    async def create_session(self, challenge):
+        """Créer une session avec le challenge"""
+        if not self.app_token:
+            raise Exception("App token non défini")
+        password_hash = hmac.new(self.app_token.encode('utf-8'), challenge.encode('utf-8'), hashlib.sha1).hexdigest()
+        return await self._call('POST', 'login/session/', "Erreur lors de la création de session", {
+            'app_id': self.sync_api.app_id,
+            'password': password_hash
+        }, use_session=False)
+
+    async def refresh_session(self):
+        """Rafraîchir la session avec le app_token stocké
+
+        Passe par renew_session : le client synchrone sérialise l'échange avec
+        ses propres renouvellements, enregistre le token et le partage.
+        """
+        if not self.app_token:
+            raise Exception("App token non défini, impossible de rafraîchir la session")
+        if not await self.renew_session(self.sync_api.session_token):
+            return {'success': False, 'msg': 'Impossible de rafraîchir la session'}
+        return {'success': True, 'result': {'session_token': self.sync_api.session_token}}
+
+    async def get_tv_channels(self, force_refresh=False):
+        """Récupérer la liste des chaînes TV (cache partagé avec le client synchrone)"""
+        api = self.sync_api
+        if api.shared_state is not None:
+            # Mode multi-workers : le client synchrone coordonne le rafraîchissement entre processus
+            return await asyncio.to_thread(api.get_tv_channels, force_refresh)
+
+        cache = api.channels_cache
+        if not force_refresh:
+            cached = cache.peek('tv_channels', fresh_only=True)
+            if cached is not None:
+                return cached
+        try:
+            result = await self._call('GET', 'tv/channels/', "Erreur lors de la récupération des chaînes")
+        except Exception:
+            # Freebox injoignable : dernière liste connue, en mémoire ou sur disque
+            stale = cache.peek('tv_channels')
+            if stale is None and api.warm_start():
+                stale = cache.peek('tv_channels')
+            if stale is None:
+                raise
+            return stale
+
+        if isinstance(result, dict) and result.get('success'):
+            cache.set('tv_channels', result)
+            if api.snapshot is not None:
+                await asyncio.to_thread(api.snapshot.save, 'tv_channels', result)
+        return result
+
+    async def get_channel_info(self, channel_id):
+        """Récupérer les informations d'une chaîne spécifique"""
+        return await self._call('GET', f'tv/channels/{channel_id}/',
+                                "Erreur lors de la récupération des infos de la chaîne")
+
+    async def get_bouquet_channels(self, bouquet_id):
+        """Récupérer les chaînes d'un bouquet"""
+        return await self._call('GET', f'tv/bouquets/{bouquet_id}/channels/',
+                                "Erreur lors de la récupération du bouquet")
+
+    async def get_current_program(self, channel_id):
+        """Récupérer le programme en cours sur une chaîne"""
+        result = await self._call('GET', f'tv/channels/{channel_id}/programs/current/',
+                                  "Erreur lors de la récupération du programme en cours")
+        if result is not None and not (isinstance(result, dict) and result.get('success') is not None):
+            return {'success': False, 'msg': 'Format de réponse inattendu', 'result': {}}
+        return result
+
+    async def get_current_programs(self, channel_ids):
+        """Récupérer en parallèle le programme en cours de plusieurs chaînes
+
+        Retourne un dictionnaire uuid -> programme (None si indisponible).
+        """
+        channel_ids = list(dict.fromkeys(channel_ids))
+        results = await asyncio.gather(
+            *(self._get_cached_current_program(channel_id) for channel_id in channel_ids),
+            return_exceptions=True
+        )
+        programs = {}
+        for channel_id, result in zip(channel_ids, results):
+            if isinstance(result, Exception):
+                print(f"Erreur programme en cours ({channel_id}): {str(result)}")
+                result = None
+            programs[channel_id] = result
+        return programs
+
+    async def _get_cached_current_program(self, channel_id):
+        """Programme en cours d'une chaîne, via le cache par chaîne du client synchrone"""
+        cache = self.sync_api.programs_cache
+        result = cache.peek(channel_id, fresh_only=True)
+        if result is None:
+            result = await self.get_current_program(channel_id)
+            if result and result.get('success'):
+                cache.set(channel_id, result)
+        if result and result.get('success'):
+            return result.get('result') or None
+        return None
+
+    async def get_epg_by_time(self, timestamp):
+        """Récupérer le guide des programmes de toutes les chaînes à partir d'un instant"""
+        return await self._call('GET', f'tv/epg/by_time/{int(timestamp)}/',
+                                "Erreur lors de la récupération de l'EPG")
+
+    async def get_epg_by_channel(self, channel_id, timestamp):
+        """Récupérer le guide des programmes d'une chaîne à partir d'un instant"""
+        return await self._call('GET', f'tv/epg/by_channel/{channel_id}/{int(timestamp)}/',
+                                "Erreur lors de la récupération de l'EPG de la chaîne")
+
+    async def get_programmed_recordings(self):
+        """Récupérer la liste des enregistrements programmés"""
+        return await self._call('GET', 'pvr/programmed/', "Erreur lors de la récupération des programmations")
+
+    async def create_recording(self, recording):
+        """Programmer un enregistrement"""
+        try:
+            response = await self._make_request('POST', 'pvr/programmed/', recording)
+            try:
+                return response.json()
+            except ValueError:
+                return None
+        except Exception as e:
+            raise Exception(f"Erreur lors de la programmation de l'enregistrement: {str(e)}")
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+from freebox import atomic_write_json
+
+
+class LogoCache:
+    """Cache disque des logos de chaînes, revalidé en arrière-plan auprès de la Freebox"""
+
+    REVALIDATE_AFTER = 24 * 3600
+    _SAFE_ID_RE = re.compile(r'[^A-Za-z0-9_.-]')
+
+    def __init__(self, freebox_api, cache_dir='data/cache/logos', revalidate_after=REVALIDATE_AFTER):
+        self.freebox_api = freebox_api
+        # Chemin absolu : send_file résout les chemins relatifs depuis le dossier de l'application
+        self.cache_dir = Path(cache_dir).resolve()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._revalidating = set()
+
+    def _paths(self, channel_id):
+        safe_id = self._SAFE_ID_RE.sub('_', channel_id)
+        return self.cache_dir / f'{safe_id}.img', self.cache_dir / f'{safe_id}.json'
+
+    def _fetch_lock(self, channel_id):
+        with self._lock:
+            return self._fetch_locks.setdefault(channel_id, threading.Lock())
+
+    def _load_meta(self, meta_path):
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, channel_id, logo_url):
+        """Retourner (chemin du fichier, métadonnées) du logo, en le téléchargeant si besoin"""
+        image_path, meta_path = self._paths(channel_id)
+        meta = self._load_meta(meta_path)
+
+        if meta is None or not image_path.exists() or meta.get('url') != logo_url:
+            # Un seul téléchargement par chaîne à la fois
+            with self._fetch_lock(channel_id):
+                meta = self._load_meta(meta_path)
+                if meta is None or not image_path.exists() or meta.get('url') != logo_url:
+                    meta = self._fetch(channel_id, logo_url, None)
+        elif time.time() - meta.get('checked_at', 0) > self.revalidate_after:
+            self._revalidate_in_background(channel_id, logo_url, meta)
+
+        return image_path, meta
+
+    def _fetch(self, channel_id, logo_url, meta):
+        """Télécharger le logo (requête conditionnelle si des métadonnées existent)"""
+        image_path, meta_path = self._paths(channel_id)
+        headers = {}
+        if meta:
+            if meta.get('upstream_etag'):
+                headers['If-None-Match'] = meta['upstream_etag']
+            if meta.get('upstream_last_modified'):
+                headers['If-Modified-Since'] = meta['upstream_last_modified']
+
+        response = self.freebox_api.download(logo_url, headers=headers)
+        if response.status_code == 304 and meta:
+            meta['checked_at'] = time.time()
+            atomic_write_json(meta_path, meta)
+            return meta
+        if response.status_code != 200:
+            raise Exception(f"Logo indisponible ({response.status_code})")
+
+        content = response.content
+        tmp_path = image_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        tmp_path.replace(image_path)
+
+        meta = {
+            'url': logo_url,
+            'etag': hashlib.sha1(content).hexdigest(),
+            'mimetype': response.headers.get('Content-Type', 'image/png'),
+            'upstream_etag': response.headers.get('ETag'),
+            'upstream_last_modified': response.headers.get('Last-Modified'),
+            'checked_at': time.time()
+        }
+        atomic_write_json(meta_path, meta)
+        return meta
+
+    def _revalidate_in_background(self, channel_id, logo_url, meta):
+        with self._lock:
+            if channel_id in self._revalidating:
+                return
+            self._revalidating.add(channel_id)
+
+        def revalidate():
+            try:
+                with self._fetch_lock(channel_id):
+                    self._fetch(channel_id, logo_url, meta)
+            except Exception as e:
+                print(f"Erreur lors de la revalidation du logo {channel_id}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(channel_id)
+
+        threading.Thread(target=revalidate, daemon=True).start()
@@ -0,0 +1,203 @@
+"""Instrumentation légère au format Prometheus
+
+Les mesures sont de simples compteurs en mémoire protégés par un verrou ;
+le texte Prometheus n'est produit qu'au moment où /metrics est interrogé.
+"""
+import bisect
+import contextvars
+import re
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_ID_SEGMENT_RE = re.compile(r'/(?:uuid-[^/]+|[0-9]+)(?=/|$)')
+
+# Compteur d'appels à la Freebox pour la requête HTTP en cours
+_upstream_calls = contextvars.ContextVar('upstream_calls', default=None)
+
+
+def normalize_endpoint(endpoint):
+    """Remplacer les identifiants d'un endpoint par des marqueurs (tv/channels/:id/...)"""
+    return _ID_SEGMENT_RE.sub('/:id', '/' + endpoint.split('?', 1)[0]).lstrip('/')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Registry:
+    """Ensemble des métriques exposées"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Produire le texte au format d'exposition Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    """Compteur monotone avec étiquettes"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Histogram:
+    """Histogramme cumulatif avec étiquettes"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+        lines = []
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            bucket_labels = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{bucket_labels} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+# Appels à l'API Freebox, étiquetés par Freebox (box, voir boxes.BoxRegistry)
+freebox_request_duration = Histogram(
+    'freebox_api_request_duration_seconds', "Durée des appels à l'API Freebox",
+    ('box', 'method', 'endpoint'))
+freebox_responses = Counter(
+    'freebox_api_responses_total', "Réponses de l'API Freebox par code HTTP",
+    ('box', 'method', 'endpoint', 'status'))
+freebox_errors = Counter(
+    'freebox_api_errors_total', "Appels à l'API Freebox en échec (timeout, connexion, circuit ouvert)",
+    ('box', 'method', 'endpoint', 'kind'))
+freebox_retries = Counter(
+    'freebox_api_retries_total', "Appels rejoués après renouvellement de session",
+    ('box', 'method', 'endpoint'))
+freebox_coalesced = Counter(
+    'freebox_api_coalesced_total', "Appels GET servis par une requête identique déjà en cours",
+    ('box', 'endpoint'))
+freebox_session_renewals = Counter(
+    'freebox_session_renewals_total', 'Renouvellements de session', ('box', 'result'))
+freebox_circuit_transitions = Counter(
+    'freebox_api_circuit_transitions_total', "Changements d'état du disjoncteur Freebox", ('box', 'state'))
+
+# Caches mémoire du client Freebox (voir cache.TTLCache)
+freebox_cache_hits = Counter(
+    'freebox_cache_hits_total', 'Lectures servies par le cache (fraîches ou périmées)', ('box', 'cache', 'freshness'))
+freebox_cache_misses = Counter(
+    'freebox_cache_misses_total', 'Lectures absentes du cache, chargées depuis la Freebox', ('box', 'cache'))
+freebox_cache_refresh_errors = Counter(
+    'freebox_cache_refresh_errors_total', 'Rafraîchissements en arrière-plan en échec', ('box', 'cache'))
+
+
+def cache_event_recorder(box, cache):
+    """Callback on_event d'un TTLCache alimentant les compteurs du cache nommé cache de la Freebox box"""
+    def record(event):
+        if event == 'miss':
+            freebox_cache_misses.inc(box, cache)
+        elif event == 'refresh_error':
+            freebox_cache_refresh_errors.inc(box, cache)
+        else:
+            freebox_cache_hits.inc(box, cache, 'fresh' if event == 'hit' else 'stale')
+    return record
+
+# Routes Flask
+route_duration = Histogram(
+    'http_request_duration_seconds', 'Durée de traitement des requêtes HTTP',
+    ('method', 'route', 'status'))
+route_upstream_calls = Histogram(
+    'http_request_upstream_calls', 'Appels à la Freebox par requête HTTP',
+    ('route',), buckets=UPSTREAM_BUCKETS)
+
+
+def begin_request_scope():
+    """Démarrer le comptage des appels Freebox pour la requête courante"""
+    return _upstream_calls.set([0])
+
+
+def end_request_scope(token):
+    """Terminer le comptage et retourner le nombre d'appels effectués"""
+    calls = _upstream_calls.get()
+    try:
+        _upstream_calls.reset(token)
+    except ValueError:
+        # Jeton créé dans un autre contexte : rien à restaurer
+        pass
+    return calls[0] if calls else 0
+
+
+def count_upstream_call():
+    calls = _upstream_calls.get()
+    if calls is not None:
+        calls[0] += 1
@@ -0,0 +1,159 @@
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RecordingTimeline:
+    """Intervalles d'enregistrement triés par début, pour des tests de chevauchement en O(log n)
+
+    Les intervalles chevauchant [start, end) ont forcément un début compris entre
+    start - durée_max et end : une recherche dichotomique borne donc la zone à examiner.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._intervals = []
+        self._max_length = 0
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def add(self, start, end, item=None):
+        """Ajouter un intervalle [start, end)"""
+        index = bisect.bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._intervals.insert(index, (start, end, item))
+        self._max_length = max(self._max_length, end - start)
+
+    def overlapping(self, start, end):
+        """Intervalles chevauchant [start, end)"""
+        low = bisect.bisect_left(self._starts, start - self._max_length)
+        high = bisect.bisect_left(self._starts, end)
+        return [interval for interval in self._intervals[low:high] if interval[1] > start]
+
+    def max_concurrency(self, start, end):
+        """Nombre maximal d'intervalles simultanés sur [start, end)"""
+        events = []
+        for other_start, other_end, _ in self.overlapping(start, end):
+            events.append((max(other_start, start), 1))
+            events.append((min(other_end, end), -1))
+        # Les fins sont traitées avant les débuts au même instant
+        events.sort(key=lambda event: (event[0], event[1]))
+
+        current = peak = 0
+        for _, delta in events:
+            current += delta
+            peak = max(peak, current)
+        return peak
+
+
+class RecordingPlanner:
+    """Planification d'enregistrements tenant compte du nombre de tuners de la Freebox"""
+
+    DEFAULT_MAX_CONCURRENT = 2
+    DEFAULT_MARGIN_BEFORE = 5 * 60
+    DEFAULT_MARGIN_AFTER = 10 * 60
+    MAX_WORKERS = 4
+
+    def __init__(self, freebox_api, epg_store=None, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 margin_before=DEFAULT_MARGIN_BEFORE, margin_after=DEFAULT_MARGIN_AFTER):
+        self.freebox_api = freebox_api
+        self.epg_store = epg_store
+        self.max_concurrent = max_concurrent
+        self.margin_before = margin_before
+        self.margin_after = margin_after
+
+    def _padded(self, program):
+        return program['start'] - self.margin_before, program['end'] + self.margin_after
+
+    def build_timeline(self, existing):
+        """Construire la frise à partir des enregistrements déjà programmés"""
+        timeline = RecordingTimeline()
+        for recording in existing:
+            if recording.get('start') is None or recording.get('end') is None:
+                continue
+            start = recording['start'] - recording.get('margin_before', 0)
+            end = recording['end'] + recording.get('margin_after', 0)
+            timeline.add(start, end, recording)
+        return timeline
+
+    def plan(self, candidates, existing, channel_ids=None):
+        """Répartir les candidats entre acceptés, doublons et conflits
+
+        Les candidats sont des programmes de l'EPG local (channel_uuid, id,
+        start, end, title). Chaque conflit est accompagné des autres diffusions
+        du même titre qui tiendraient dans le planning.
+        """
+        timeline = self.build_timeline(existing)
+        already_programmed = {
+            (recording.get('channel_uuid'), recording.get('start'))
+            for recording in existing
+        }
+
+        accepted, duplicates, conflicts = [], [], []
+        for program in sorted(candidates, key=lambda p: p['start']):
+            if (program['channel_uuid'], program['start']) in already_programmed:
+                duplicates.append(program)
+                continue
+
+            start, end = self._padded(program)
+            if timeline.max_concurrency(start, end) < self.max_concurrent:
+                timeline.add(start, end, program)
+                already_programmed.add((program['channel_uuid'], program['start']))
+                accepted.append(program)
+                continue
+
+            conflicts.append({
+                'program': program,
+                'conflicts_with': [item for _, _, item in timeline.overlapping(start, end)],
+                'alternatives': self._alternatives(program, timeline, channel_ids)
+            })
+
+        return {'accepted': accepted, 'duplicates': duplicates, 'conflicts': conflicts}
+
+    def _alternatives(self, program, timeline, channel_ids):
+        """Autres diffusions du même programme compatibles avec le planning"""
+        if self.epg_store is None or not program.get('title'):
+            return []
+        alternatives = []
+        for airing in self.epg_store.find_airings(program['title'], program['end'], channel_ids):
+            if airing['channel_uuid'] == program['channel_uuid'] and airing['id'] == program['id']:
+                continue
+            if timeline.max_concurrency(*self._padded(airing)) < self.max_concurrent:
+                alternatives.append(airing)
+        return alternatives
+
+    def recording_payload(self, program):
+        """Corps de la requête POST pvr/programmed/ pour un programme"""
+        return {
+            'channel_uuid': program['channel_uuid'],
+            'start': program['start'],
+            'end': program['end'],
+            'margin_before': self.margin_before,
+            'margin_after': self.margin_after,
+            'name': program.get('title') or 'Sans titre',
+            'subname': program.get('sub_title') or ''
+        }
+
+    def submit(self, programs):
+        """Programmer en parallèle les enregistrements acceptés"""
+        results = {'created': [], 'failed': []}
+        if not programs:
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix='pvr') as executor:
+            futures = [
+                (program, executor.submit(self.freebox_api.create_recording, self.recording_payload(program)))
+                for program in programs
+            ]
+            for program, future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    results['failed'].append({'program': program, 'error': str(e)})
+                    continue
+                if result and result.get('success'):
+                    results['created'].append(result.get('result'))
+                else:
+                    error = result.get('msg', 'Échec de la programmation') if result else "Pas de réponse de l'API"
+                    results['failed'].append({'program': program, 'error': error})
+        return results
@@ -0,0 +1,173 @@
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from freebox import atomic_write_json
+
+# Profil de la requête en cours, propagé aux tâches lancées avec son contexte
+_current_capture = contextvars.ContextVar('profile_capture', default=None)
+
+
+def frame_label(code):
+    """Libellé d'une fonction dans une pile : nom (fichier), sans numéro de ligne"""
+    parts = Path(code.co_filename).parts
+    return f"{code.co_name} ({'/'.join(parts[-2:])})"
+
+
+def collapse_stack(frame):
+    """Pile d'appels au format « replié » des flamegraphs (racine;...;feuille)"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class ProfileCapture:
+    """Échantillons des piles d'une requête (son thread et ceux qui travaillent pour elle)"""
+
+    __slots__ = ('thread_id', 'started', 'stacks', 'samples', 'token')
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.token = None
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+
+
+class SamplingProfiler:
+    """Profileur par échantillonnage des threads qui servent les requêtes
+
+    Un seul thread relève toutes les interval secondes la pile des threads
+    suivis (sys._current_frames) : le code profilé n'est pas instrumenté.
+    Les appels lancés via run_attached (pool de threads) sont inclus.
+    Les profils sont enregistrés au format « collapsed stacks », lisible par
+    flamegraph.pl, speedscope ou inferno, avec leurs métadonnées à côté.
+    """
+
+    INTERVAL = 0.005
+    KEEP = 100
+    NAME_PATTERN = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-z_-]+$')
+
+    def __init__(self, profile_dir='data/cache/profiles', interval=INTERVAL, keep=KEEP):
+        self.profile_dir = Path(profile_dir)
+        self.interval = interval
+        self.keep = keep
+        # Thread suivi -> profil auquel ses échantillons sont ajoutés
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Commencer à échantillonner le thread courant"""
+        capture = ProfileCapture(threading.get_ident())
+        capture.token = _current_capture.set(capture)
+        self._track(capture.thread_id, capture)
+        return capture
+
+    def stop(self, capture):
+        """Arrêter l'échantillonnage et retourner la durée écoulée (secondes)"""
+        with self._lock:
+            for thread_id in [t for t, c in self._threads.items() if c is capture]:
+                del self._threads[thread_id]
+        if capture.token is not None:
+            _current_capture.reset(capture.token)
+            capture.token = None
+        return time.perf_counter() - capture.started
+
+    def run_attached(self, func):
+        """Exécuter func en ajoutant ses échantillons au profil de la requête en cours"""
+        capture = _current_capture.get()
+        if capture is None:
+            return func()
+        thread_id = threading.get_ident()
+        self._track(thread_id, capture)
+        try:
+            return func()
+        finally:
+            with self._lock:
+                if self._threads.get(thread_id) is capture:
+                    del self._threads[thread_id]
+
+    def _track(self, thread_id, capture):
+        with self._lock:
+            self._threads[thread_id] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='profiler', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        # Le thread s'arrête dès qu'il n'y a plus rien à échantillonner
+        while True:
+            with self._lock:
+                if not self._threads:
+                    self._thread = None
+                    return
+                threads = list(self._threads.items())
+            frames = sys._current_frames()
+            samples = [(thread_id, capture, collapse_stack(frames[thread_id]))
+                       for thread_id, capture in threads if thread_id in frames]
+            del frames
+            # Rien n'est ajouté à un profil après stop()
+            with self._lock:
+                for thread_id, capture, stack in samples:
+                    if self._threads.get(thread_id) is capture:
+                        capture.stacks[stack] += 1
+                        if thread_id == capture.thread_id:
+                            capture.samples += 1
+            time.sleep(self.interval)
+
+    def save(self, capture, duration, **meta):
+        """Enregistrer un profil (.folded) et ses métadonnées (.json), retourne son nom"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^0-9a-z]+', '_', (meta.get('path') or '').lower()).strip('_') or 'index'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug[:40]}-{int(duration * 1000)}ms"
+        lines = [f"{stack} {count}" for stack, count in capture.stacks.most_common()]
+        with open(self.profile_dir / f'{name}.folded', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        atomic_write_json(self.profile_dir / f'{name}.json', dict(meta, **{
+            'name': name,
+            'duration_ms': round(duration * 1000, 1),
+            'samples': capture.samples,
+            'interval_ms': self.interval * 1000,
+            'created_at': time.time()
+        }))
+        self._prune()
+        return name
+
+    def _prune(self):
+        # Ne garder que les keep profils les plus récents
+        metas = sorted(self.profile_dir.glob('*.json'), reverse=True)
+        for meta_file in metas[self.keep:]:
+            for path in (meta_file, meta_file.with_suffix('.folded')):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit=KEEP):
+        """Métadonnées des profils enregistrés, du plus récent au plus ancien"""
+        profiles = []
+        if not self.profile_dir.exists():
+            return profiles
+        for meta_file in sorted(self.profile_dir.glob('*.json'), reverse=True)[:limit]:
+            try:
+                with open(meta_file, 'r') as f:
+                    profiles.append(json.load(f))
+            except Exception as e:
+                print(f"Erreur lors de la lecture du profil {meta_file.name}: {str(e)}")
+        return profiles
+
+    def path(self, name):
+        """Fichier .folded du profil name (None si le nom est invalide ou inconnu)"""
+        if not self.NAME_PATTERN.match(name or ''):
+            return None
+        path = self.profile_dir / f'{name}.folded'
+        return path if path.exists() else None
@@ -0,0 +1,226 @@
+import bisect
+import threading
+import time
+from datetime import datetime
+
+from epg import fold_text
+
+
+def format_recording(recording):
+    """Mettre en forme une programmation pvr/programmed/ pour l'affichage"""
+    start = recording.get('start')
+    end = recording.get('end')
+    return {
+        'id': recording.get('id'),
+        'title': recording.get('name', 'Sans titre'),  # name au lieu de title
+        'channel': recording.get('channel_name', 'Chaîne inconnue'),
+        'channel_uuid': recording.get('channel_uuid'),
+        'start': start,
+        'end': end,
+        # Convertir les timestamps Unix en dates lisibles
+        'start_time': datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M') if start else 'Inconnu',
+        'end_time': datetime.fromtimestamp(end).strftime('%Y-%m-%d %H:%M') if end else 'Inconnu',
+        'status': recording.get('state', 'inconnu')  # state au lieu de status
+    }
+
+
+class RecordingsStore:
+    """Copie locale des programmations PVR, indexée par identifiant
+
+    Chaque synchronisation compare la réponse pvr/programmed/ à la copie locale
+    et ne met en forme que les programmations ajoutées ou modifiées. Les pages
+    et le endpoint JSON lisent uniquement la copie locale.
+    """
+
+    SYNC_INTERVAL = 60
+
+    def __init__(self, freebox_api, snapshot=None, sync_interval=SYNC_INTERVAL):
+        self.freebox_api = freebox_api
+        # Dernières programmations connues sur disque, voir snapshot.SnapshotStore
+        self.snapshot = snapshot
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._syncing = False
+        self._raw = {}
+        self._records = {}
+        self._ordered = []
+        self._keys = []
+        self.version = 0
+        self.loaded = False
+        # Horodatage (time.time) des données, et instant (monotonic) de la dernière synchronisation
+        self.updated_at = None
+        self.last_sync = None
+        self.last_error = None
+        self.last_diff = None
+
+    def load_snapshot(self):
+        """Reprendre les programmations du dernier instantané (démarrage à chaud)"""
+        if self.snapshot is None:
+            return False
+        saved = self.snapshot.load('recordings')
+        if saved is None:
+            return False
+        data, saved_at = saved
+        with self._lock:
+            self._apply(data.get('result') or [])
+            self.loaded = True
+            self.updated_at = saved_at
+        return True
+
+    def sync(self):
+        """Synchroniser la copie locale avec la Freebox
+
+        Retourne les identifiants ajoutés, modifiés et supprimés.
+        """
+        with self._sync_lock:
+            try:
+                data = self._fetch()
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            return self.update(data.get('result') or [])
+
+    def update(self, recordings):
+        """Remplacer la copie locale par une liste pvr/programmed/ (de ce worker ou d'un autre)"""
+        with self._lock:
+            diff = self._apply(recordings)
+            self.loaded = True
+            self.updated_at = time.time()
+            self.last_sync = time.monotonic()
+            self.last_error = None
+            self.last_diff = diff
+        # Même sans changement : une liste vide ou identique doit aussi exister sur disque
+        if self.snapshot is not None:
+            self.snapshot.save('recordings', {'success': True, 'result': recordings})
+        return diff
+
+    def raw(self):
+        """Programmations telles que renvoyées par la Freebox"""
+        with self._lock:
+            return list(self._raw.values())
+
+    def _fetch(self):
+        # La session expirée est renouvelée par l'API
+        response = self.freebox_api._make_request('GET', 'pvr/programmed/')
+        if response.status_code == 403:
+            raise Exception("Accès refusé: authentification requise pour le PVR")
+        if response.status_code == 404:
+            raise Exception("Endpoint PVR non disponible sur cette Freebox")
+        if response.status_code != 200:
+            raise Exception(f"Erreur PVR: {response.status_code} - {response.text}")
+        data = response.json()
+        if not data.get('success'):
+            raise Exception(f"Erreur PVR: {data.get('msg', 'réponse invalide')}")
+        return data
+
+    def _apply(self, recordings):
+        # Appelé avec le verrou : seules les programmations nouvelles ou modifiées sont remises en forme
+        current = {recording.get('id'): recording for recording in recordings if recording.get('id') is not None}
+        added = [recording_id for recording_id in current if recording_id not in self._raw]
+        changed = [recording_id for recording_id, recording in current.items()
+                   if recording_id in self._raw and self._raw[recording_id] != recording]
+        removed = [recording_id for recording_id in self._raw if recording_id not in current]
+
+        for recording_id in removed:
+            del self._records[recording_id]
+        for recording_id in added + changed:
+            self._records[recording_id] = format_recording(current[recording_id])
+        self._raw = current
+
+        if added or changed or removed:
+            self._ordered = sorted(self._records.values(), key=self._sort_key)
+            self._keys = [self._sort_key(record) for record in self._ordered]
+            self.version += 1
+        return {'added': added, 'changed': changed, 'removed': removed}
+
+    @staticmethod
+    def _sort_key(record):
+        return (record['start'] or 0, record['id'])
+
+    def is_stale(self):
+        return self.last_sync is None or time.monotonic() - self.last_sync > self.sync_interval
+
+    def ensure_fresh(self):
+        """Synchroniser si la copie est trop ancienne
+
+        En arrière-plan si une copie (éventuellement issue de l'instantané) est
+        déjà disponible, sinon immédiatement.
+        """
+        if not self.is_stale():
+            return
+        if self.loaded:
+            self.sync_in_background()
+        else:
+            self.sync()
+
+    def sync_in_background(self):
+        """Lancer une synchronisation en arrière-plan (une seule à la fois)"""
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+
+        def run():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Erreur lors de la synchronisation des programmations: {str(e)}")
+            finally:
+                with self._lock:
+                    self._syncing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def list(self):
+        """Toutes les programmations, triées par heure de début"""
+        with self._lock:
+            return list(self._ordered)
+
+    def get(self, recording_id):
+        with self._lock:
+            return self._records.get(recording_id)
+
+    def page(self, after=None, limit=50, status=None, channel_uuid=None, query=None, start=None, end=None):
+        """Page de programmations triées par début, après la clé de tri after
+
+        Retourne (programmations, clé du dernier élément ou None s'il n'y a plus rien).
+        """
+        folded = fold_text(query) if query else None
+        with self._lock:
+            ordered, keys = self._ordered, self._keys
+        try:
+            position = bisect.bisect_right(keys, tuple(after)) if after is not None else 0
+        except TypeError:
+            raise ValueError('Curseur invalide')
+        if start is not None:
+            position = max(position, bisect.bisect_left(keys, (start,)))
+
+        records = []
+        for position in range(position, len(ordered)):
+            record = ordered[position]
+            if end is not None and (record['start'] or 0) >= end:
+                break
+            if status is not None and record['status'] != status:
+                continue
+            if channel_uuid is not None and record['channel_uuid'] != channel_uuid:
+                continue
+            if folded and folded not in fold_text(record['title']):
+                continue
+            records.append(record)
+            if len(records) >= limit:
+                return records, keys[position] if position + 1 < len(ordered) else None
+        return records, None
+
+    def status(self):
+        """État de la copie locale, pour l'affichage et le diagnostic"""
+        with self._lock:
+            return {
+                'count': len(self._records),
+                'version': self.version,
+                'loaded': self.loaded,
+                'updated_at': self.updated_at,
+                'stale': self.is_stale(),
+                'last_error': self.last_error,
+                'last_diff': self.last_diff
+            }
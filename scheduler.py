@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def job_key(name, group=None):
+    return f'{group}:{name}' if group else name
+
+
+class ScheduledJob:
+    """Tâche périodique et son dernier état d'exécution"""
+
+    def __init__(self, name, func, interval, initial_delay=0, condition=None,
+                 retry_delay=30, max_backoff=30 * 60, description=None, group=None):
+        self.name = name
+        # Groupe de la tâche (ex. nom de la Freebox) : même nom possible dans plusieurs groupes
+        self.group = group
+        self.key = job_key(name, group)
+        self.func = func
+        self.interval = interval
+        # condition() fausse : tâche sautée (ex. pas encore authentifié)
+        self.condition = condition
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.description = description or name
+        self.next_run = time.time() + initial_delay
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_status = None
+        self.last_error = None
+
+
+class Scheduler:
+    """Planificateur de rafraîchissements en arrière-plan
+
+    Chaque tâche est relancée à son intervalle, avec une variation aléatoire
+    (jitter) pour étaler les appels, et un délai doublé à chaque échec
+    consécutif (backoff). Une tâche n'est jamais exécutée deux fois en parallèle.
+    """
+
+    JITTER = 0.1
+    MAX_WORKERS = 3
+    STOP_TIMEOUT = 10
+
+    def __init__(self, jitter=JITTER, max_workers=MAX_WORKERS):
+        self.jitter = jitter
+        self.max_workers = max_workers
+        self._jobs = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = None
+        # Tâches soumises et pas encore terminées (future -> tâche), attendues par stop()
+        self._pending = {}
+        self._stopped = False
+
+    def add(self, name, func, interval, **options):
+        """Ajouter une tâche func() exécutée toutes les interval secondes"""
+        job = ScheduledJob(name, func, interval, **options)
+        with self._condition:
+            self._jobs[job.key] = job
+            self._condition.notify()
+
+    def start(self):
+        """Démarrer le thread du planificateur (sans effet s'il tourne déjà)"""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scheduler')
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Arrêter le planificateur et attendre (au plus timeout secondes) les tâches en cours"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread, self._thread = self._thread, None
+            executor, self._executor = self._executor, None
+            pending = list(self._pending)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            wait(pending, timeout=max(deadline - time.monotonic(), 0))
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def run_now(self, name, group=None):
+        """Avancer la prochaine exécution d'une tâche à maintenant"""
+        with self._condition:
+            job = self._jobs.get(job_key(name, group))
+            if job is None:
+                return False
+            job.next_run = time.time()
+            self._condition.notify()
+            return True
+
+    def _loop(self):
+        with self._condition:
+            while not self._stopped:
+                now = time.time()
+                for job in self._jobs.values():
+                    if not job.running and job.next_run <= now:
+                        job.running = True
+                        future = self._executor.submit(self._run, job)
+                        self._pending[future] = job
+                        future.add_done_callback(self._forget)
+                waiting = [job.next_run for job in self._jobs.values() if not job.running]
+                timeout = max(min(waiting) - now, 0.05) if waiting else None
+                self._condition.wait(timeout)
+
+    def _forget(self, future):
+        with self._condition:
+            job = self._pending.pop(future, None)
+            # Tâche annulée par stop() avant d'avoir démarré : à relancer au prochain start()
+            if job is not None and future.cancelled():
+                job.running = False
+
+    def _run(self, job):
+        start = time.perf_counter()
+        status, error = 'ok', None
+        try:
+            if job.condition is not None and not job.condition():
+                status = 'skipped'
+            else:
+                job.func()
+        except Exception as e:
+            status, error = 'error', str(e)
+            print(f"Erreur de la tâche planifiée {job.key}: {error}")
+
+        with self._condition:
+            job.running = False
+            job.last_run = time.time()
+            job.last_duration = time.perf_counter() - start
+            job.last_status = status
+            job.last_error = error
+            if status == 'ok':
+                job.runs += 1
+                job.failures = 0
+                delay = job.interval
+            elif status == 'skipped':
+                delay = min(job.interval, job.retry_delay)
+            else:
+                job.failures += 1
+                delay = min(job.retry_delay * 2 ** (job.failures - 1), job.max_backoff)
+            job.next_run = job.last_run + delay * (1 + random.uniform(-self.jitter, self.jitter))
+            self._condition.notify()
+
+    def status(self, group=None):
+        """État des tâches (du groupe group si fourni) : dernière exécution, durée, résultat et prochaine exécution"""
+        with self._condition:
+            return [{
+                'name': job.name,
+                'group': job.group,
+                'description': job.description,
+                'interval': job.interval,
+                'running': job.running,
+                'runs': job.runs,
+                'failures': job.failures,
+                'last_run': job.last_run,
+                'last_duration': job.last_duration,
+                'last_status': job.last_status,
+                'last_error': job.last_error,
+                'next_run': job.next_run
+            } for job in self._jobs.values() if group is None or job.group == group]
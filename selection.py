@@ -0,0 +1,108 @@
+import json
+import threading
+from pathlib import Path
+
+from freebox import atomic_write_json, file_lock
+
+
+class SelectedChannelsStore:
+    """Chaînes sélectionnées gardées en mémoire, avec écriture différée et atomique du fichier
+
+    En mode partagé (plusieurs workers), chaque modification relit le fichier
+    s'il a changé et l'écrit immédiatement sous verrou de fichier.
+    """
+
+    FLUSH_DELAY = 0.5
+
+    def __init__(self, config_dir='data/config', flush_delay=FLUSH_DELAY, shared=False):
+        self.selected_file = Path(config_dir) / 'selected_channels.json'
+        self.lock_file = Path(config_dir) / 'selected_channels.json.lock'
+        self.flush_delay = flush_delay
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._signature = None
+        self._selected = self._load()
+        self._dirty = False
+        self._timer = None
+
+    def _file_signature(self):
+        try:
+            stat = self.selected_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load(self):
+        self._signature = self._file_signature()
+        if self._signature is None:
+            return set()
+        try:
+            with open(self.selected_file, 'r') as f:
+                return set(json.load(f).get('selected', []))
+        except Exception as e:
+            print(f"Erreur lors du chargement des sélections: {str(e)}")
+            return set()
+
+    def _reload_if_changed(self):
+        # Appelé avec le verrou : reprendre les écritures des autres workers
+        if self.shared and self._file_signature() != self._signature:
+            self._selected = self._load()
+
+    def get(self):
+        """Retourner une copie de l'ensemble des chaînes sélectionnées"""
+        with self._lock:
+            self._reload_if_changed()
+            return set(self._selected)
+
+    def replace(self, channel_ids):
+        """Remplacer toute la sélection"""
+        return self._modify(lambda selected: set(channel_ids))
+
+    def toggle(self, channel_id):
+        """Basculer la sélection d'une chaîne, retourne la nouvelle sélection"""
+        return self._modify(lambda selected: selected ^ {channel_id})
+
+    def update(self, select=(), deselect=()):
+        """Sélectionner et désélectionner plusieurs chaînes en une opération"""
+        return self._modify(lambda selected: (selected | set(select)) - set(deselect))
+
+    def _modify(self, change):
+        if self.shared:
+            with self._lock, file_lock(self.lock_file):
+                self._reload_if_changed()
+                self._selected = change(self._selected)
+                self._write()
+                return set(self._selected)
+
+        with self._lock:
+            self._selected = change(self._selected)
+            self._schedule_flush()
+            return set(self._selected)
+
+    def _write(self):
+        # Appelé avec le verrou
+        atomic_write_json(self.selected_file, {'selected': sorted(self._selected)})
+        self._signature = self._file_signature()
+
+    def _schedule_flush(self):
+        # Appelé avec le verrou : regroupe les modifications rapprochées en une écriture
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Écrire la sélection sur disque si elle a changé"""
+        with self._lock:
+            self._timer = None
+            if not self._dirty:
+                return True
+            self._dirty = False
+            try:
+                self._write()
+                return True
+            except Exception as e:
+                print(f"Erreur lors de la sauvegarde des sélections: {str(e)}")
+                self._dirty = True
+                return False
@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+
+class SharedState:
+    """État partagé entre les processus workers (SQLite en mode WAL)
+
+    Fournit un magasin clé/valeur JSON horodaté et des baux (leases) servant
+    de verrous inter-processus : un seul worker rafraîchit la session ou la
+    liste des chaînes pendant que les autres attendent puis relisent le résultat.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+    """
+    LEASE_TTL = 30
+    LEASE_POLL_INTERVAL = 0.05
+
+    def __init__(self, db_path='data/cache/shared.sqlite'):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._local = threading.local()
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=10000')
+        return conn
+
+    def _conn(self):
+        # Une connexion par thread, réutilisée entre les appels
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def get(self, key, max_age=None):
+        """Retourner la valeur partagée (None si absente ou plus vieille que max_age)"""
+        row = self._conn().execute(
+            'SELECT value, updated_at FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Publier une valeur pour tous les workers"""
+        self._conn().execute(
+            'INSERT INTO entries (key, value, updated_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at',
+            (key, json.dumps(value), time.time())
+        )
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def try_acquire(self, name, ttl=LEASE_TTL):
+        """Tenter de prendre le bail name, retourne True en cas de succès"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now:
+                conn.execute('COMMIT')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)',
+                (name, self.owner, now + ttl)
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release(self, name):
+        self._conn().execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.owner))
+
+    @contextmanager
+    def lease(self, name, ttl=LEASE_TTL, timeout=None):
+        """Bail inter-processus : attend qu'il soit libre (au plus timeout secondes)
+
+        Produit True si le bail a été obtenu, False si l'attente a expiré.
+        """
+        deadline = time.monotonic() + (ttl if timeout is None else timeout)
+        acquired = self.try_acquire(name, ttl)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(self.LEASE_POLL_INTERVAL)
+            acquired = self.try_acquire(name, ttl)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(name)
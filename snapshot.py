@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from freebox import atomic_write_json
+
+
+class SnapshotStore:
+    """Dernières données connues (chaînes, programmations) conservées sur disque
+
+    Chaque instantané est un fichier JSON versionné, réécrit de façon atomique
+    uniquement quand les données changent. Au démarrage ou quand la Freebox
+    est injoignable, l'application s'affiche à partir de ces fichiers.
+    """
+
+    VERSION = 1
+
+    def __init__(self, snapshot_dir='data/cache/snapshots'):
+        self.snapshot_dir = Path(snapshot_dir)
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _path(self, name):
+        return self.snapshot_dir / f'{name}.json'
+
+    def load(self, name):
+        """Retourner (données, horodatage) du dernier instantané, ou None"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._read(name)
+                if entry is not None:
+                    self._entries[name] = entry
+        if entry is None:
+            return None
+        return entry['data'], entry['saved_at']
+
+    def _read(self, name):
+        path = self._path(name)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except Exception as e:
+            print(f"Erreur lors du chargement de l'instantané {name}: {str(e)}")
+            return None
+        # Format d'une version antérieure : ignoré plutôt que mal interprété
+        if not isinstance(entry, dict) or entry.get('version') != self.VERSION:
+            return None
+        return entry
+
+    def save(self, name, data):
+        """Enregistrer un instantané (sans écriture si les données sont inchangées)"""
+        with self._lock:
+            entry = self._entries.get(name) or self._read(name)
+            if entry is not None and entry['data'] == data:
+                self._entries[name] = entry
+                return False
+            entry = {'version': self.VERSION, 'saved_at': time.time(), 'data': data}
+            try:
+                atomic_write_json(self._path(name), entry)
+            except Exception as e:
+                print(f"Erreur lors de l'enregistrement de l'instantané {name}: {str(e)}")
+                return False
+            self._entries[name] = entry
+            return True
@@ -0,0 +1,53 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules de l'application à la racine du dépôt
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def mock_freebox():
+    """Freebox simulée (bench.mock_freebox) démarrée pour un test"""
+    from bench.mock_freebox import MockFreebox
+
+    with MockFreebox(channel_count=20, latency=0.05) as mock:
+        yield mock
+
+
+@pytest.fixture
+def freebox_api(mock_freebox):
+    """Client authentifié auprès de la Freebox simulée"""
+    from freebox import FreeboxAPI
+
+    api = FreeboxAPI(mock_freebox.api_base_url, app_token=mock_freebox.state.app_token)
+    api.refresh_session()
+    mock_freebox.state.request_counts.clear()
+    yield api
+    api.close()
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """Module app importé depuis un répertoire de travail temporaire
+
+    L'application lit et écrit ses données dans data/ relatif au répertoire courant.
+    """
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    module = importlib.import_module('app')
+    yield module
+    module.box_registry.shutdown()
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def authenticated_client(app_module, monkeypatch):
+    """Client de test de l'application, session Freebox considérée comme créée"""
+    service = app_module.freebox_service
+    monkeypatch.setattr(service, 'credentials', dict(service.credentials, auth_status='session_created'))
+    monkeypatch.setattr(service.config, 'is_stale', lambda: False)
+    return app_module.app.test_client()
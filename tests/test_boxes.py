@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize('payload', [
+    [{'name': 'salon', 'api_base_url': 'https://192.168.0.254/api/v4/'}],
+    'salon',
+    {'name': ['salon'], 'api_base_url': 'https://192.168.0.254/api/v4/'},
+    {'name': 'salon', 'api_base_url': 42},
+    {'name': 'salon', 'api_base_url': 'ftp://192.168.0.254/'},
+    {'name': 'nom invalide', 'api_base_url': 'https://192.168.0.254/api/v4/'},
+])
+def test_malformed_box_is_rejected(app_module, payload):
+    response = app_module.app.test_client().post('/boxes', json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert app_module.box_registry.names() == ['default']
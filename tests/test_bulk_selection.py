@@ -0,0 +1,63 @@
+import pytest
+
+CHANNELS = {
+    'success': True,
+    'result': {
+        'uuid-webtv-1': {'uuid': 'uuid-webtv-1', 'name': 'Une', 'available': True, 'favorite': True},
+        'uuid-webtv-2': {'uuid': 'uuid-webtv-2', 'name': 'Deux', 'available': True},
+    }
+}
+
+
+class FakeFreeboxAPI:
+    def get_tv_channels(self):
+        return CHANNELS
+
+
+@pytest.fixture
+def client(authenticated_client, app_module, monkeypatch):
+    service = app_module.freebox_service
+    monkeypatch.setattr(service, 'get_api', lambda: (FakeFreeboxAPI(), service.config, dict(service.credentials)))
+    service.selection.replace(set())
+    return authenticated_client
+
+
+@pytest.mark.parametrize('payload', [
+    [1, 2],
+    'uuid-webtv-1',
+    {'channel_ids': 'uuid-webtv-1'},
+    {'channel_ids': [1, 2]},
+    {'channel_ids': [{'uuid': 'uuid-webtv-1'}]},
+    {'channel_ids': ['']},
+    {'action': 'inverser', 'channel_ids': ['uuid-webtv-1']},
+])
+def test_malformed_payload_is_rejected(client, app_module, payload):
+    response = client.post('/bulk_selection', json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert app_module.freebox_service.selection.get() == set()
+
+
+def test_unknown_channels_are_rejected(client, app_module):
+    response = client.post('/bulk_selection', json={'channel_ids': ['uuid-webtv-1', 'uuid-inconnue']})
+
+    assert response.status_code == 400
+    assert 'uuid-inconnue' in response.get_json()['error']
+    assert app_module.freebox_service.selection.get() == set()
+
+
+def test_known_channels_are_selected(client):
+    response = client.post('/bulk_selection', json={'channel_ids': ['uuid-webtv-2'], 'favorites': True})
+
+    assert response.status_code == 200
+    assert set(response.get_json()['selected']) == {'uuid-webtv-1', 'uuid-webtv-2'}
+
+
+def test_channel_no_longer_listed_can_be_deselected(client, app_module):
+    app_module.freebox_service.selection.replace({'uuid-webtv-1', 'uuid-supprimee'})
+
+    response = client.post('/bulk_selection', json={'action': 'deselect', 'channel_ids': ['uuid-supprimee']})
+
+    assert response.status_code == 200
+    assert response.get_json()['selected'] == ['uuid-webtv-1']
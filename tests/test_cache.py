@@ -0,0 +1,87 @@
+import threading
+import time
+
+import metrics
+from cache import TTLCache
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_fresh_value_is_served_without_reloading():
+    cache = TTLCache(ttl=60)
+    calls = []
+    loader = lambda: calls.append(1) or len(calls)
+
+    assert cache.get('key', loader) == 1
+    assert cache.get('key', loader) == 1
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_expired_value_is_served_while_refreshed_once_in_background():
+    cache = TTLCache(ttl=0.05)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(2)
+        return len(calls)
+
+    cache.get('key', loader)
+    time.sleep(0.06)
+
+    # Valeur périmée renvoyée immédiatement, un seul rafraîchissement lancé
+    assert cache.get('key', loader) == 1
+    assert cache.get('key', loader) == 1
+    release.set()
+    assert wait_for(lambda: cache.peek('key', fresh_only=True) == 2)
+    assert len(calls) == 2
+    assert cache.stats()['stale_hits'] == 2
+
+
+def test_value_past_max_stale_is_reloaded_synchronously():
+    cache = TTLCache(ttl=0.01, max_stale=0)
+    values = iter([1, 2])
+    cache.get('key', lambda: next(values))
+    time.sleep(0.02)
+
+    assert cache.get('key', lambda: next(values)) == 2
+
+
+def test_should_cache_rejects_failed_results():
+    cache = TTLCache(ttl=60)
+    cache.get('key', lambda: {'success': False}, should_cache=lambda r: r['success'])
+
+    assert cache.peek('key') is None
+
+
+def test_callable_ttl_uses_loaded_value():
+    cache = TTLCache(ttl=lambda value: value)
+    cache.get('short', lambda: 0.01)
+    cache.get('long', lambda: 60)
+    time.sleep(0.02)
+
+    assert cache.peek('short', fresh_only=True) is None
+    assert cache.peek('long', fresh_only=True) == 60
+
+
+def test_lookups_are_reported_to_metrics():
+    cache = TTLCache(ttl=60, on_event=metrics.cache_event_recorder('salon', 'test_cache'))
+    misses = metrics.freebox_cache_misses.value('salon', 'test_cache')
+    hits = metrics.freebox_cache_hits.value('salon', 'test_cache', 'fresh')
+
+    cache.get('key', lambda: 1)
+    cache.get('key', lambda: 1)
+
+    assert metrics.freebox_cache_misses.value('salon', 'test_cache') == misses + 1
+    assert metrics.freebox_cache_hits.value('salon', 'test_cache', 'fresh') == hits + 1
+    assert 'freebox_cache_hits_total{box="salon",cache="test_cache",freshness="fresh"}' in metrics.REGISTRY.render()
@@ -0,0 +1,49 @@
+import pytest
+
+from channel_index import decode_cursor, encode_cursor
+
+CHANNELS = {
+    'success': True,
+    'result': {
+        f'uuid-webtv-{index}': {'uuid': f'uuid-webtv-{index}', 'name': name, 'available': True}
+        for index, name in enumerate(['Zèbre', 'Arte', 'Mezzo', 'Canal', 'Océan'], start=1)
+    }
+}
+
+
+class FakeFreeboxAPI:
+    def get_tv_channels(self):
+        return CHANNELS
+
+
+@pytest.fixture
+def client(authenticated_client, app_module, monkeypatch):
+    service = app_module.freebox_service
+    monkeypatch.setattr(service, 'get_api', lambda: (FakeFreeboxAPI(), service.config, dict(service.credentials)))
+    return authenticated_client
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(('arte', 'uuid-webtv-2'), 'name'), 'name') == ('arte', 'uuid-webtv-2')
+
+
+@pytest.mark.parametrize('cursor', ['%%%', 'W10', encode_cursor(('uuid-webtv-2',), 'uuid')])
+def test_invalid_or_foreign_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'name')
+
+
+def test_pages_follow_each_other(client):
+    first = client.get('/api/channels?order=name&limit=2&fields=name').get_json()
+    second = client.get(f"/api/channels?order=name&limit=2&fields=name&cursor={first['next_cursor']}").get_json()
+
+    assert [c['name'] for c in first['result'] + second['result']] == ['Arte', 'Canal', 'Mezzo', 'Océan']
+
+
+def test_cursor_from_another_order_is_rejected(client):
+    first = client.get('/api/channels?order=name&limit=2').get_json()
+
+    response = client.get(f"/api/channels?order=uuid&limit=2&cursor={first['next_cursor']}")
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,95 @@
+import pytest
+
+import circuit
+from circuit import CircuitBreaker
+from test_freebox import run_concurrently
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    states = []
+    breaker = CircuitBreaker(failure_threshold=3, base_delay=5, max_delay=60, on_state_change=states.append)
+    breaker.states = states
+    return breaker
+
+
+def test_opens_after_threshold_consecutive_failures(breaker):
+    breaker.record_failure('timeout')
+    breaker.record_failure('timeout')
+    assert breaker.allow_request()
+
+    breaker.record_failure('timeout')
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_in() == 5
+    assert breaker.status()['last_error'] == 'timeout'
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_single_half_open_probe(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 5
+
+    allowed = run_concurrently(breaker.allow_request, 8)
+
+    assert allowed.count(True) == 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+    assert breaker.states == [CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN, CircuitBreaker.CLOSED]
+
+
+def test_failed_probes_double_the_delay_up_to_max(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    delays = []
+    for _ in range(6):
+        delays.append(breaker.retry_in())
+        clock.now += breaker.retry_in()
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+    assert delays == [5, 10, 20, 40, 60, 60]
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_open_circuit_fails_fast_without_calling_the_freebox(freebox_api, mock_freebox):
+    from freebox import FreeboxUnavailableError
+
+    mock_freebox.state.error_rate = 1.0
+    for _ in range(freebox_api.breaker.failure_threshold):
+        assert freebox_api._make_request('GET', 'tv/channels/').status_code == 500
+    calls = dict(mock_freebox.state.request_counts)
+
+    with pytest.raises(FreeboxUnavailableError):
+        freebox_api._make_request('GET', 'tv/channels/')
+
+    assert mock_freebox.state.request_counts == calls
@@ -0,0 +1,25 @@
+def test_get_api_returns_a_copy_of_credentials(app_module):
+    service = app_module.FreeboxService('copy', 'data/boxes/copy/config', 'data/boxes/copy/cache')
+    credentials = service.get_api()[2]
+    credentials['auth_status'] = 'waiting_approval'
+
+    assert service.get_api()[2]['auth_status'] == 'not_started'
+    service.shutdown()
+
+
+def test_failed_save_keeps_previous_state(app_module, monkeypatch):
+    service = app_module.FreeboxService('failing', 'data/boxes/failing/config', 'data/boxes/failing/cache')
+    monkeypatch.setattr(service.config, 'save_credentials', lambda credentials: False)
+
+    assert service.save_credentials({'auth_status': 'waiting_approval'}) is False
+    assert service.get_api()[2]['auth_status'] == 'not_started'
+    service.shutdown()
+
+
+def test_successful_save_updates_memory_and_disk(app_module):
+    service = app_module.FreeboxService('saved', 'data/boxes/saved/config', 'data/boxes/saved/cache')
+
+    assert service.save_credentials({'auth_status': 'waiting_approval', 'track_id': 7}) is True
+    assert service.get_api()[2]['track_id'] == 7
+    assert service.config.load_credentials()['auth_status'] == 'waiting_approval'
+    service.shutdown()
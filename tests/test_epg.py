@@ -0,0 +1,95 @@
+import sqlite3
+from contextlib import closing
+
+from epg import EpgStore, tokenize_title
+
+# Schéma de la première version de la base EPG, sans index plein texte
+SCHEMA_WITHOUT_FTS = EpgStore.SCHEMA
+
+
+def program(program_id, title, channel_uuid='c1', start=1000):
+    return {
+        'id': program_id, 'channel_uuid': channel_uuid, 'start': start, 'end': start + 3600,
+        'duration': 3600, 'title': title, 'category_name': 'Film'
+    }
+
+
+def create_legacy_db(db_path):
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.executescript(SCHEMA_WITHOUT_FTS)
+        conn.execute(
+            "INSERT INTO programs (id, channel_uuid, start, end, duration, title, category_name, updated_at) "
+            "VALUES ('p1', 'c1', 1000, 4600, 3600, 'Amélie', 'Film', 0)"
+        )
+
+
+def assert_fts_consistent(db_path):
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("INSERT INTO programs_fts (programs_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_upgrade_indexes_existing_programs(tmp_path):
+    db_path = tmp_path / 'epg.sqlite'
+    create_legacy_db(db_path)
+
+    store = EpgStore(db_path)
+
+    assert [p['id'] for p in store.search_programs('amelie')] == ['p1']
+    assert_fts_consistent(db_path)
+
+
+def test_upsert_after_upgrade_keeps_index_valid(tmp_path):
+    db_path = tmp_path / 'epg.sqlite'
+    create_legacy_db(db_path)
+    store = EpgStore(db_path)
+
+    store.store_window(0, ['c1'], [program('p1', 'Le Grand Bleu'), program('p2', 'Amélie Poulain', start=5000)])
+
+    assert [p['id'] for p in store.search_programs('bleu')] == ['p1']
+    assert [p['id'] for p in store.search_programs('amelie')] == ['p2']
+    assert_fts_consistent(db_path)
+
+
+def test_index_created_without_rebuild_is_repaired(tmp_path):
+    db_path = tmp_path / 'epg.sqlite'
+    create_legacy_db(db_path)
+    # Index ajouté sans reconstruction, comme le faisait la version précédente
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.executescript(EpgStore.FTS_SCHEMA)
+
+    store = EpgStore(db_path)
+    store.store_window(0, ['c1'], [program('p1', 'Le Grand Bleu')])
+
+    assert [p['id'] for p in store.search_programs('bleu')] == ['p1']
+    assert_fts_consistent(db_path)
+
+
+def test_search_ignores_accents_and_matches_prefixes(tmp_path):
+    store = EpgStore(tmp_path / 'epg.sqlite')
+    store.store_window(0, ['c1'], [program('p1', 'Les Évadés'), program('p2', 'Titanic', start=5000)])
+
+    assert [p['id'] for p in store.search_programs('evad')] == ['p1']
+    assert [p['id'] for p in store.search_programs('TITAN')] == ['p2']
+
+
+def test_text_search_combined_with_filters(tmp_path):
+    store = EpgStore(tmp_path / 'epg.sqlite')
+    programs = [
+        dict(program(f'p{index}', title, channel_uuid=f'c{index % 3}', start=1000 + index * 3600),
+             category_name='Film' if index % 2 else 'Série')
+        for index, title in enumerate(['Amélie', 'Le Fabuleux Destin d\'Amélie', 'Titanic', 'Amélie Nothomb',
+                                       'Les Évadés', 'Amélie', 'Amelie encore', 'Autre'] * 4)
+    ]
+    store.store_window(0, ['c0', 'c1', 'c2'], programs)
+    filters = {'channel_ids': ['c0', 'c1'], 'category_name': 'Film', 'start': 5000, 'end': 80000,
+               'min_duration': 600}
+
+    expected = [
+        p['id'] for p in sorted(programs, key=lambda p: (p['start'], p['channel_uuid']))
+        if any(word.startswith('amel') for word in tokenize_title(p['title']))
+        and p['channel_uuid'] in ('c0', 'c1') and p['category_name'] == 'Film'
+        and p['end'] > 5000 and p['start'] < 80000
+    ]
+
+    assert expected
+    assert [p['id'] for p in store.search_programs('amel', **filters)] == expected
@@ -0,0 +1,224 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+
+def run_concurrently(func, count):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        results[index] = func()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_bulk_executor_is_created_once_under_concurrency(freebox_api, monkeypatch):
+    import freebox
+
+    created = []
+    original = freebox.ThreadPoolExecutor
+
+    def counting_executor(*args, **kwargs):
+        created.append(kwargs.get('max_workers'))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(freebox, 'ThreadPoolExecutor', counting_executor)
+    run_concurrently(lambda: freebox_api.get_current_programs(['uuid-webtv-1', 'uuid-webtv-2']), 8)
+
+    assert created == [freebox_api.bulk_workers]
+
+
+def test_current_programs_are_cached_per_channel(freebox_api, mock_freebox):
+    channel_ids = ['uuid-webtv-1', 'uuid-webtv-2', 'uuid-webtv-1']
+    programs = freebox_api.get_current_programs(channel_ids)
+    freebox_api.get_current_programs(channel_ids)
+
+    assert set(programs) == {'uuid-webtv-1', 'uuid-webtv-2'}
+    assert all(program for program in programs.values())
+    assert mock_freebox.state.request_counts == {'GET tv/channels/*/programs/current/': 2}
+
+
+
+def test_expired_session_is_renewed_once_for_concurrent_requests(freebox_api, mock_freebox):
+    refreshed = []
+    freebox_api.on_session_refreshed = refreshed.append
+    expired = freebox_api.session_token
+    mock_freebox.state.sessions.clear()
+    # Endpoints distincts : les requêtes ne sont pas regroupées avant la Freebox
+    indexes = itertools.count(1)
+
+    responses = run_concurrently(
+        lambda: freebox_api._make_request('GET', f'tv/channels/uuid-webtv-{next(indexes)}/'), 8
+    )
+
+    assert [response.status_code for response in responses] == [200] * 8
+    assert freebox_api.session_token != expired
+    assert refreshed == [freebox_api.session_token]
+    assert mock_freebox.state.request_counts['POST login/session/'] == 1
+
+
+def test_failed_renewal_is_not_retried_by_concurrent_requests(freebox_api, mock_freebox):
+    mock_freebox.state.sessions.clear()
+    # Le token d'application n'est plus reconnu : l'ouverture de session échoue
+    mock_freebox.state.app_token = 'revoque'
+    indexes = itertools.count(1)
+
+    responses = run_concurrently(
+        lambda: freebox_api._make_request('GET', f'tv/channels/uuid-webtv-{next(indexes)}/'), 8
+    )
+
+    assert [response.status_code for response in responses] == [403] * 8
+    assert mock_freebox.state.request_counts['POST login/session/'] == 1
+
+
+def test_identical_concurrent_gets_share_one_call(freebox_api, mock_freebox):
+    mock_freebox.state.latency = 0.2
+
+    responses = run_concurrently(lambda: freebox_api._make_request('GET', 'tv/channels/'), 8)
+
+    assert mock_freebox.state.request_counts == {'GET tv/channels/': 1}
+    assert all(response.json() == responses[0].json() for response in responses)
+    assert freebox_api._in_flight == {}
+
+
+def test_coalesced_callers_get_their_own_json(freebox_api, mock_freebox):
+    mock_freebox.state.latency = 0.2
+
+    responses = run_concurrently(lambda: freebox_api._make_request('GET', 'tv/channels/'), 4)
+    responses[0].json()['result'].clear()
+
+    assert mock_freebox.state.request_counts == {'GET tv/channels/': 1}
+    assert all(len(response.json()['result']) == 20 for response in responses[1:])
+
+
+def test_sequential_gets_are_not_coalesced(freebox_api, mock_freebox):
+    freebox_api._make_request('GET', 'tv/channels/')
+    freebox_api._make_request('GET', 'tv/channels/')
+
+    assert mock_freebox.state.request_counts == {'GET tv/channels/': 2}
+
+
+def test_coalesced_get_error_reaches_every_caller(freebox_api, monkeypatch):
+    calls = []
+
+    def failing_send(*args):
+        calls.append(args)
+        time.sleep(0.2)
+        raise Exception("Erreur de connexion à l'API Freebox: refusée")
+
+    def call():
+        try:
+            return freebox_api._make_request('GET', 'tv/channels/')
+        except Exception as e:
+            return e
+
+    monkeypatch.setattr(freebox_api, '_send', failing_send)
+    errors = run_concurrently(call, 8)
+
+    assert len(calls) == 1
+    assert all(isinstance(error, Exception) and 'refusée' in str(error) for error in errors)
+    assert freebox_api._in_flight == {}
+
+
+def test_posts_are_not_coalesced(freebox_api, mock_freebox):
+    mock_freebox.state.latency = 0.2
+    recording = {'channel_uuid': 'uuid-webtv-1', 'start': 0, 'end': 60, 'name': 'Test'}
+
+    run_concurrently(lambda: freebox_api._make_request('POST', 'pvr/programmed/', recording), 4)
+
+    assert mock_freebox.state.request_counts == {'POST pvr/programmed/': 4}
+    assert len(mock_freebox.state.recordings) == 4
+
+
+def test_api_and_logo_downloads_keep_their_connections(freebox_api, mock_freebox):
+    # Les logos passent par une autre origine (http) que l'API : même situation avec un autre hôte
+    logo_url = mock_freebox.api_base_url.replace('127.0.0.1', 'localhost') + 'tv/img/channels/logo.png'
+    for _ in range(5):
+        freebox_api._make_request('GET', 'tv/channels/')
+        freebox_api.download(logo_url)
+
+    stats = freebox_api.get_pool_stats()
+
+    assert stats['pools'] == 2
+    assert stats['requests'] >= 10
+    assert stats['connections'] == 2
+
+
+def test_request_metrics_are_labelled_with_the_box(mock_freebox):
+    import metrics
+    from freebox import FreeboxAPI
+
+    before = metrics.freebox_responses.value('salon', 'GET', 'tv/channels/', '200')
+    with FreeboxAPI(mock_freebox.api_base_url, app_token=mock_freebox.state.app_token, box='salon') as api:
+        api.refresh_session()
+        api.get_tv_channels()
+
+    assert metrics.freebox_responses.value('salon', 'GET', 'tv/channels/', '200') == before + 1
+    assert metrics.freebox_cache_misses.value('salon', 'tv_channels') >= 1
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+
+def test_coalesced_caller_honours_its_own_timeout(freebox_api, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_send(*args):
+        started.set()
+        release.wait(5)
+        return FakeResponse(b'{"success": true}')
+
+    monkeypatch.setattr(freebox_api, '_send', slow_send)
+    leader = threading.Thread(target=freebox_api._make_request, args=('GET', 'tv/channels/'))
+    leader.start()
+    assert started.wait(2)
+
+    begin = time.monotonic()
+    with pytest.raises(Exception, match='pas de réponse'):
+        freebox_api._make_request('GET', 'tv/channels/', timeout=(0.1, 0.1))
+    elapsed = time.monotonic() - begin
+    release.set()
+    leader.join()
+
+    assert elapsed < 1
+
+
+def test_get_after_write_does_not_join_older_call(freebox_api, monkeypatch):
+    first_get, release = threading.Event(), threading.Event()
+    sent = []
+
+    def send(method, endpoint, data, session_token, timeout):
+        sent.append(method)
+        if method == 'GET' and not first_get.is_set():
+            first_get.set()
+            release.wait(5)
+            return FakeResponse(b'{"success": true, "result": []}')
+        return FakeResponse(b'{"success": true, "result": [{"id": 1}]}')
+
+    monkeypatch.setattr(freebox_api, '_send', send)
+    before = threading.Thread(target=freebox_api._make_request, args=('GET', 'pvr/programmed/'))
+    before.start()
+    assert first_get.wait(2)
+
+    freebox_api._make_request('POST', 'pvr/programmed/', {'channel_uuid': 'uuid-webtv-1'})
+    after = freebox_api._make_request('GET', 'pvr/programmed/')
+    release.set()
+    before.join()
+
+    assert sent == ['GET', 'POST', 'GET']
+    assert after.json()['result'] == [{'id': 1}]
+    assert freebox_api._in_flight == {}
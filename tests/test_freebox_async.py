@@ -0,0 +1,69 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from freebox import FreeboxAPI
+from freebox_async import AsyncFreeboxAPI, async_available
+
+pytestmark = pytest.mark.skipif(not async_available(), reason='aiohttp non installé')
+
+
+@pytest.fixture
+def stalled_server():
+    """Serveur qui accepte les connexions mais ne répond jamais"""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    connections = []
+    stop = threading.Event()
+
+    def accept():
+        server.settimeout(0.1)
+        while not stop.is_set():
+            try:
+                connections.append(server.accept()[0])
+            except socket.timeout:
+                continue
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.getsockname()[1]}/api/v4/'
+    stop.set()
+    thread.join()
+    for connection in connections:
+        connection.close()
+    server.close()
+
+
+def test_request_honours_default_read_timeout(stalled_server):
+    sync_api = FreeboxAPI(stalled_server, timeout=0.3, connect_timeout=0.3)
+
+    async def run():
+        async with AsyncFreeboxAPI(sync_api) as api:
+            return await api.get_challenge()
+
+    start = time.monotonic()
+    with pytest.raises(Exception, match='Erreur lors de la récupération du challenge'):
+        asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert time.monotonic() - start < 2
+    sync_api.close()
+
+
+def test_refresh_session_goes_through_sync_renewal(freebox_api, mock_freebox):
+    refreshed = []
+    freebox_api.on_session_refreshed = refreshed.append
+    previous = freebox_api.session_token
+
+    async def run():
+        async with AsyncFreeboxAPI(freebox_api) as api:
+            return await api.refresh_session()
+
+    result = asyncio.run(run())
+
+    assert result['success']
+    assert freebox_api.session_token not in (None, previous)
+    assert refreshed == [freebox_api.session_token]
+    assert mock_freebox.state.request_counts['POST login/session/'] == 1
@@ -0,0 +1,37 @@
+from logos import LogoCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class FakeApi:
+    def __init__(self):
+        self.downloads = []
+
+    def download(self, url, headers=None, timeout=None):
+        self.downloads.append((url, headers))
+        return FakeResponse(200, b'PNG', {'Content-Type': 'image/png', 'ETag': '"v1"'})
+
+
+def test_logo_path_is_absolute_and_independent_of_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = LogoCache(FakeApi(), cache_dir='data/cache/logos')
+    image_path, meta = cache.get('uuid-webtv-201', 'http://box/logo.png')
+
+    monkeypatch.chdir('/')
+    assert image_path.is_absolute()
+    assert image_path.read_bytes() == b'PNG'
+    assert meta['mimetype'] == 'image/png'
+
+
+def test_logo_is_downloaded_once(tmp_path):
+    api = FakeApi()
+    cache = LogoCache(api, cache_dir=tmp_path)
+    cache.get('uuid-webtv-201', 'http://box/logo.png')
+    cache.get('uuid-webtv-201', 'http://box/logo.png')
+
+    assert len(api.downloads) == 1
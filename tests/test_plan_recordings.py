@@ -0,0 +1,23 @@
+import pytest
+
+
+@pytest.mark.parametrize('payload', [
+    ['not', 'a', 'dict'],
+    {'programs': 'uuid-webtv-201'},
+    {'programs': ['uuid-webtv-201']},
+    {'programs': [{'channel_uuid': 'uuid-webtv-201'}]},
+    {'programs': [{'channel_uuid': 42, 'id': 'p1'}]},
+    {'programs': [{'channel_uuid': 'uuid-webtv-201', 'id': None}]},
+])
+def test_malformed_payload_is_rejected(authenticated_client, payload):
+    response = authenticated_client.post('/plan_recordings', json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_empty_program_list_is_rejected(authenticated_client):
+    response = authenticated_client.post('/plan_recordings', json={'programs': []})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Aucun programme fourni'
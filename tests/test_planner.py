@@ -0,0 +1,87 @@
+from planner import RecordingPlanner, RecordingTimeline
+
+HOUR = 3600
+
+
+def program(program_id, start, channel_uuid='c1', duration=HOUR, title=None):
+    return {'id': program_id, 'channel_uuid': channel_uuid, 'start': start, 'end': start + duration,
+            'title': title or program_id}
+
+
+def recording(start, channel_uuid='c9', duration=HOUR):
+    return {'channel_uuid': channel_uuid, 'start': start, 'end': start + duration}
+
+
+def test_timeline_counts_concurrent_intervals():
+    timeline = RecordingTimeline()
+    timeline.add(0, 100)
+    timeline.add(50, 150)
+    timeline.add(100, 200)
+
+    assert timeline.max_concurrency(0, 200) == 2
+    assert timeline.max_concurrency(150, 200) == 1
+    # Intervalles semi-ouverts : [0, 100) et [100, 200) ne se chevauchent pas
+    assert len(timeline.overlapping(200, 300)) == 0
+
+
+def test_program_is_accepted_while_a_tuner_is_free():
+    planner = RecordingPlanner(None, max_concurrent=2, margin_before=0, margin_after=0)
+    plan = planner.plan([program('p1', 10 * HOUR)], [recording(10 * HOUR)])
+
+    assert [p['id'] for p in plan['accepted']] == ['p1']
+    assert plan['conflicts'] == []
+
+
+def test_conflict_when_all_tuners_are_busy():
+    planner = RecordingPlanner(None, max_concurrent=2, margin_before=0, margin_after=0)
+    existing = [recording(10 * HOUR), recording(10 * HOUR, channel_uuid='c8')]
+    plan = planner.plan([program('p1', 10 * HOUR + 600)], existing)
+
+    assert plan['accepted'] == []
+    assert len(plan['conflicts']) == 1
+    assert len(plan['conflicts'][0]['conflicts_with']) == 2
+
+
+def test_margins_create_conflicts_between_back_to_back_programs():
+    planner = RecordingPlanner(None, max_concurrent=1, margin_before=300, margin_after=600)
+    plan = planner.plan([program('p1', 10 * HOUR), program('p2', 11 * HOUR)], [])
+
+    assert [p['id'] for p in plan['accepted']] == ['p1']
+    assert [c['program']['id'] for c in plan['conflicts']] == ['p2']
+
+
+def test_already_programmed_program_is_a_duplicate():
+    planner = RecordingPlanner(None, margin_before=0, margin_after=0)
+    plan = planner.plan([program('p1', 10 * HOUR, channel_uuid='c9')], [recording(10 * HOUR)])
+
+    assert [p['id'] for p in plan['duplicates']] == ['p1']
+
+
+def test_conflict_suggests_later_airings_that_fit(tmp_path):
+    from epg import EpgStore
+
+    store = EpgStore(tmp_path / 'epg.sqlite')
+    store.store_window(0, ['c1', 'c2'], [
+        dict(program('p1', 10 * HOUR, title='Le Grand Bleu'), duration=HOUR),
+        dict(program('p2', 20 * HOUR, channel_uuid='c2', title='Le Grand Bleu'), duration=HOUR),
+    ])
+    planner = RecordingPlanner(None, store, max_concurrent=1, margin_before=0, margin_after=0)
+    plan = planner.plan(store.get_programs([('c1', 'p1')]), [recording(10 * HOUR)])
+
+    alternatives = plan['conflicts'][0]['alternatives']
+    assert [(a['channel_uuid'], a['id']) for a in alternatives] == [('c2', 'p2')]
+
+
+class FakeApi:
+    def create_recording(self, payload):
+        if payload['name'] == 'boom':
+            raise Exception('Erreur de connexion')
+        return {'success': True, 'result': {'id': payload['start']}}
+
+
+def test_submit_reports_created_and_failed_recordings():
+    planner = RecordingPlanner(FakeApi())
+    results = planner.submit([program('ok', 10 * HOUR), program('boom', 12 * HOUR)])
+
+    assert [r['id'] for r in results['created']] == [10 * HOUR]
+    assert [f['program']['id'] for f in results['failed']] == ['boom']
@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    return app_module.app.test_client()
+
+
+def test_admin_token_is_accepted_from_header(client):
+    assert client.get('/profiles', headers={'X-Magneto-Admin-Token': 'secret'}).status_code == 200
+
+
+def test_admin_token_is_ignored_in_query_string(client):
+    assert client.get('/profiles?admin_token=secret').status_code == 403
+    assert client.get('/profiles', headers={'X-Magneto-Admin-Token': 'wrong'}).status_code == 403
+
+
+def test_profiled_request_is_listed_without_token_in_links(client, app_module):
+    headers = {'X-Magneto-Admin-Token': 'secret'}
+    client.get('/connection?profile=1', headers=headers)
+
+    profiles = client.get('/profiles?format=json', headers=headers).get_json()['profiles']
+    assert profiles and profiles[0]['path'] == '/connection'
+    page = client.get('/profiles', headers=headers).get_data(as_text=True)
+    assert f"/profiles/{profiles[0]['name']}" in page
+    assert 'secret' not in page
+    folded = client.get(f"/profiles/{profiles[0]['name']}", headers=headers).get_data(as_text=True)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in folded.splitlines() if line)
+
+
+def test_profile_flag_without_admin_rights_is_ignored(client, app_module):
+    before = len(app_module.profiler.list())
+    client.get('/connection?profile=1')
+
+    assert len(app_module.profiler.list()) == before
@@ -0,0 +1,40 @@
+from recordings import RecordingsStore
+from snapshot import SnapshotStore
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeFreeboxAPI:
+    def __init__(self, recordings):
+        self.recordings = recordings
+
+    def _make_request(self, method, endpoint):
+        return FakeResponse({'success': True, 'result': self.recordings})
+
+
+def test_empty_recording_list_is_saved_for_next_start(tmp_path):
+    store = RecordingsStore(FakeFreeboxAPI([]), snapshot=SnapshotStore(tmp_path))
+    store.sync()
+
+    restarted = RecordingsStore(FakeFreeboxAPI([]), snapshot=SnapshotStore(tmp_path))
+
+    assert restarted.load_snapshot()
+    assert restarted.list() == []
+
+
+def test_synced_recordings_are_restored_from_snapshot(tmp_path):
+    recording = {'id': 1, 'name': 'Le Grand Bleu', 'start': 1000, 'end': 4600, 'state': 'waiting_start'}
+    RecordingsStore(FakeFreeboxAPI([recording]), snapshot=SnapshotStore(tmp_path)).sync()
+
+    restarted = RecordingsStore(FakeFreeboxAPI([]), snapshot=SnapshotStore(tmp_path))
+
+    assert restarted.load_snapshot()
+    assert [r['title'] for r in restarted.list()] == ['Le Grand Bleu']
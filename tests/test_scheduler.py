@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import Scheduler
+from shared_state import SharedState
+
+
+def start_with_job(func):
+    scheduler = Scheduler()
+    scheduler.add('job', func, 60)
+    scheduler.start()
+    return scheduler
+
+
+def test_stop_waits_for_running_job():
+    started, finished = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        time.sleep(0.2)
+        finished.set()
+
+    scheduler = start_with_job(job)
+    assert started.wait(2)
+    scheduler.stop()
+
+    assert finished.is_set()
+    assert not scheduler.running
+
+
+def test_stop_gives_up_after_timeout():
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+
+    scheduler = start_with_job(job)
+    assert started.wait(2)
+    begin = time.monotonic()
+    scheduler.stop(timeout=0.1)
+    elapsed = time.monotonic() - begin
+    release.set()
+
+    assert elapsed < 1
+
+
+@pytest.fixture
+def workers(app_module, tmp_path):
+    """Deux workers servant la même Freebox, avec leur état partagé"""
+    services = []
+    for name in ('w1', 'w2'):
+        service = app_module.FreeboxService(name, tmp_path / name / 'config', tmp_path / name / 'cache')
+        service.shared_state = SharedState(tmp_path / 'shared.sqlite')
+        services.append(service)
+    yield services
+    for service in services:
+        service.shutdown()
+
+
+def test_only_one_worker_polls_recordings(workers):
+    leader, follower = workers
+    recording = {'id': 1, 'name': 'Le Grand Bleu', 'start': 1000, 'end': 4600, 'state': 'waiting_start'}
+    polls = []
+
+    def fetch():
+        polls.append(1)
+        return {'success': True, 'result': [recording]}
+
+    leader.recordings._fetch = fetch
+    follower.recordings._fetch = fetch
+
+    leader._scheduled_recordings_sync()
+    follower._scheduled_recordings_sync()
+
+    assert len(polls) == 1
+    assert [r['title'] for r in follower.recordings.list()] == ['Le Grand Bleu']
+
+
+def test_only_one_worker_polls_current_programs(workers):
+    polls = []
+    for service in workers:
+        service.api.get_current_programs = lambda channel_ids, name=service.name: polls.append(name)
+
+    for _ in range(2):
+        for service in workers:
+            service._scheduled_now_playing()
+
+    assert polls == ['w1', 'w1']
@@ -0,0 +1,70 @@
+import pytest
+
+from shared_state import SharedState
+
+
+@pytest.fixture
+def shared_db(tmp_path):
+    return tmp_path / 'shared.sqlite'
+
+
+@pytest.fixture
+def other_worker(shared_db):
+    """État partagé vu par un second worker, sur la même base"""
+    return SharedState(shared_db)
+
+
+@pytest.fixture
+def shared_api(freebox_api, shared_db):
+    freebox_api.shared_state = SharedState(shared_db)
+    freebox_api.SHARED_LEASE_TIMEOUT = 0.2
+    return freebox_api
+
+
+def test_lease_yields_false_while_another_worker_holds_it(shared_db, other_worker):
+    state = SharedState(shared_db)
+    assert other_worker.try_acquire('refresh')
+    with state.lease('refresh', timeout=0.1) as acquired:
+        assert acquired is False
+    other_worker.release('refresh')
+    with state.lease('refresh', timeout=0.1) as acquired:
+        assert acquired is True
+
+
+def test_channels_fall_back_to_shared_list_when_lease_is_held(shared_api, other_worker, mock_freebox):
+    other_worker.set('tv_channels', {'success': True, 'result': {'uuid-1': {'name': 'Partagée'}}})
+    other_worker._conn().execute('UPDATE entries SET updated_at = 0')
+    assert other_worker.try_acquire('tv_channels_refresh')
+
+    result = shared_api.get_tv_channels()
+
+    assert result['result'] == {'uuid-1': {'name': 'Partagée'}}
+    assert mock_freebox.state.request_counts == {}
+
+
+def test_channels_are_not_fetched_without_lease_or_shared_list(shared_api, other_worker, mock_freebox):
+    assert other_worker.try_acquire('tv_channels_refresh')
+
+    result = shared_api._load_tv_channels()
+
+    assert result['success'] is False
+    assert mock_freebox.state.request_counts == {}
+
+
+def test_session_is_not_renewed_without_lease(shared_api, other_worker, mock_freebox):
+    expired = shared_api.session_token
+    assert other_worker.try_acquire('session_refresh')
+
+    assert shared_api.renew_session(expired) is False
+    assert shared_api.session_token == expired
+    assert mock_freebox.state.request_counts == {}
+
+
+def test_session_published_by_lease_holder_is_adopted(shared_api, other_worker, mock_freebox):
+    expired = shared_api.session_token
+    assert other_worker.try_acquire('session_refresh')
+    other_worker.set('session_token', 'nouvelle-session')
+
+    assert shared_api.renew_session(expired) is True
+    assert shared_api.session_token == 'nouvelle-session'
+    assert mock_freebox.state.request_counts == {}